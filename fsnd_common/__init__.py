@@ -0,0 +1,6 @@
+"""Code shared by the FSND Flask apps.
+
+Put the root of this repository on the PYTHONPATH to use it:
+
+    export PYTHONPATH=/path/to/FSND
+"""
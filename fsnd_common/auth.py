@@ -0,0 +1,533 @@
+"""Auth0 bearer token authentication shared by the FSND Flask apps.
+
+    auth = Auth("tenant.eu.auth0.com", "my-api")
+
+    @app.route("/drinks-detail")
+    @auth.requires_auth("get:drinks-detail")
+    def drinks_detail(payload):
+        ...
+
+Tokens are verified with RS256 keys looked up by kid in a key source, a
+JWKSKeyStore fetching the keys of the tenant by default. The verified
+payloads are cached until their exp, with their permissions as a
+frozenset, so a token sent again is neither verified nor scanned again.
+
+Functions added to `Auth.timing_hooks` are called with the name of every
+stage of the verification and the seconds it took: "cache" (looking the
+token up in the verified tokens), "header" (decoding the token), "key",
+"signature" and "claims".
+"""
+import base64
+import hashlib
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+from urllib.request import urlopen
+
+from flask import request
+from jose import jwk
+
+
+class AuthError(Exception):
+    """A standardized way to communicate auth failure modes."""
+
+    def __init__(self, error, status_code):
+        self.error = error
+        self.status_code = status_code
+
+
+def get_token_auth_header():
+    """Obtains the Access Token from the Authorization Header
+    """
+    auth = request.headers.get("Authorization", None)
+    if not auth:
+        raise AuthError(
+            {
+                "code": "authorization_header_missing",
+                "description": "Authorization header is expected.",
+            },
+            401,
+        )
+
+    parts = auth.split()
+    if parts[0].lower() != "bearer":
+        raise AuthError(
+            {
+                "code": "invalid_header",
+                "description": 'Authorization header must start with "Bearer".',
+            },
+            401,
+        )
+
+    elif len(parts) == 1:
+        raise AuthError(
+            {"code": "invalid_header", "description": "Token not found."}, 401
+        )
+
+    elif len(parts) > 2:
+        raise AuthError(
+            {
+                "code": "invalid_header",
+                "description": "Authorization header must be bearer token.",
+            },
+            401,
+        )
+
+    token = parts[1]
+    return token
+
+
+def permission_set(permissions):
+    """Returns `permissions`, a permission or an iterable of them, as a
+    frozenset.
+    """
+    if isinstance(permissions, str):
+        return frozenset((permissions,)) if permissions else frozenset()
+    return frozenset(permissions)
+
+
+def claimed_permissions(payload):
+    """Returns the permissions claim of `payload` as a frozenset, None if it
+    has no permissions claim.
+    """
+    permissions = payload.get("permissions")
+    if permissions is None:
+        return None
+    try:
+        return permission_set(permissions)
+    except TypeError:
+        raise AuthError(
+            {"code": "invalid_claims", "description": "Permissions malformed."},
+            401,
+        )
+
+
+def check_permissions(permission, payload):
+    if "permissions" not in payload:
+        raise AuthError(
+            {
+                "code": "invalid_claims",
+                "description": "Permissions not included in JWT.",
+            },
+            400,
+        )
+
+    if not permission_set(permission) <= claimed_permissions(payload):
+        raise AuthError(
+            {"code": "unauthorized", "description": "Permission not found."}, 403
+        )
+    return True
+
+
+def b64decode(segment):
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+## Key sources
+
+
+class KeySource(ABC):
+    """Where the keys verifying the tokens come from.
+
+    `get(kid)` returns the key object of `kid`, as made by
+    `jose.jwk.construct`, or None if there is no such key. The same object
+    must be returned for as long as the key does not change.
+    """
+
+    algorithm = "RS256"
+
+    @abstractmethod
+    def get(self, kid):
+        pass
+
+    def construct(self, key):
+        return jwk.construct(
+            {f: key[f] for f in ("kty", "kid", "use", "n", "e") if f in key},
+            self.algorithm,
+        )
+
+
+class StaticKeys(KeySource):
+    """Keys given once, as a JWKS."""
+
+    def __init__(self, jwks, algorithm="RS256"):
+        self.algorithm = algorithm
+        self._keys = {key["kid"]: self.construct(key) for key in jwks["keys"]}
+
+    def get(self, kid):
+        return self._keys.get(kid)
+
+
+class JWKSKeyStore(KeySource):
+    """Signing keys of an Auth0 tenant, fetched from its JWKS and indexed
+    by kid.
+
+    The JWKS is fetched once and trusted for `ttl` seconds, instead of on
+    every request. Concurrent refreshes are collapsed into one fetch, the
+    other threads wait for its keys. A kid missing from the keys forces a
+    refresh, at most once every `min_refresh_interval` seconds so that
+    tokens with made up kids cannot hammer Auth0. If a refresh fails the
+    keys already fetched keep being used.
+
+    `start()` refreshes the keys in a background thread before they
+    expire, so requests never wait for Auth0 once the keys are fetched.
+    """
+
+    def __init__(
+        self, url, ttl=600, min_refresh_interval=30, timeout=5, algorithm="RS256"
+    ):
+        self.url = url
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        self.algorithm = algorithm
+        self.fetches = 0
+        self._keys = {}
+        self._fetched_at = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def fetch(self):
+        with urlopen(self.url, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def refresh(self, force=False):
+        """Fetches the keys if they expired, or if `force`, unless another
+        thread did while this one was waiting.
+        """
+        fetched_at = self._fetched_at
+        with self._lock:
+            if self._fetched_at != fetched_at:
+                return
+            if self._fetched_at is not None:
+                age = time.monotonic() - self._fetched_at
+                if age < (self.min_refresh_interval if force else self.ttl):
+                    return
+            self.fetches += 1
+            try:
+                jwks = self.fetch()
+            except Exception:
+                if not self._keys:
+                    raise AuthError(
+                        {
+                            "code": "jwks_unavailable",
+                            "description": "Unable to fetch the signing keys.",
+                        },
+                        503,
+                    )
+                # keep the old keys, and retry after min_refresh_interval
+                self._fetched_at = time.monotonic() - max(
+                    self.ttl - self.min_refresh_interval, 0
+                )
+                return
+            keys = {}
+            for key in jwks["keys"]:
+                if "kid" not in key:
+                    continue
+                # keep the key objects that did not change, the tokens
+                # verified with them stay cached
+                old = self._keys.get(key["kid"])
+                if old is not None and old[0] == key:
+                    keys[key["kid"]] = old
+                    continue
+                try:
+                    keys[key["kid"]] = (key, self.construct(key))
+                except Exception:
+                    continue
+            self._keys = keys
+            self._fetched_at = time.monotonic()
+
+    def get(self, kid):
+        if self._fetched_at is None or time.monotonic() - self._fetched_at >= self.ttl:
+            self.refresh()
+        key = self._keys.get(kid)
+        if key is None:
+            self.refresh(force=True)
+            key = self._keys.get(kid)
+        return key and key[1]
+
+    def start(self, interval=None):
+        """Starts refreshing the keys every `interval` seconds, by default
+        halfway through their ttl.
+        """
+        if self._thread is not None:
+            return
+        with self._thread_lock:
+            # the first requests may all try to start it
+            if self._thread is not None:
+                return
+            interval = interval or self.ttl / 2
+            self._stopped.clear()
+            self._thread = threading.Thread(
+                target=self._run, args=(interval,), name="jwks-refresh", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        with self._thread_lock:
+            if self._thread is not None:
+                self._thread.join()
+                self._thread = None
+
+    def _run(self, interval):
+        while not self._stopped.is_set():
+            try:
+                self.refresh(force=True)
+            except AuthError:
+                pass
+            self._stopped.wait(interval)
+
+
+## Verified tokens
+
+
+class VerifiedTokenCache:
+    """Tokens already verified, so that a token sent again skips the
+    RS256 signature verification.
+
+    Entries are keyed by a hash of the token and hold its payload, its
+    permissions and the key that verified it. They are dropped at the
+    token's exp, and the least recently used ones are evicted beyond
+    `maxsize` entries. Tokens without exp are not cached.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(token):
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token):
+        """Returns the (exp, kid, key, payload, permissions) of `token`, or
+        None if it is not cached or expired.
+        """
+        digest = self.digest(token)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                if entry[0] > time.time():
+                    self._entries.move_to_end(digest)
+                    self.hits += 1
+                    return entry
+                del self._entries[digest]
+            self.misses += 1
+        return None
+
+    def put(self, token, kid, key, payload):
+        exp = payload.get("exp")
+        if not self.maxsize or not isinstance(exp, (int, float)):
+            return
+        permissions = claimed_permissions(payload)
+        with self._lock:
+            self._entries[self.digest(token)] = (exp, kid, key, payload, permissions)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, token):
+        with self._lock:
+            self._entries.pop(self.digest(token), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+## Auth
+
+
+class Auth:
+    """Verifies the RS256 bearer tokens of an Auth0 API.
+
+    `keys` is the KeySource of the signing keys, by default the JWKS of
+    the tenant; `cache_size` bounds the verified tokens kept, 0 verifies
+    every request.
+    """
+
+    def __init__(
+        self,
+        domain,
+        audience,
+        keys=None,
+        algorithms=("RS256",),
+        cache_size=1024,
+        leeway=0,
+    ):
+        self.issuer = f"https://{domain}/"
+        self.audience = audience
+        self.algorithms = frozenset(algorithms)
+        self.keys = keys or JWKSKeyStore(f"https://{domain}/.well-known/jwks.json")
+        self.tokens = VerifiedTokenCache(cache_size)
+        self.leeway = leeway
+        self.timing_hooks = []
+
+    @contextmanager
+    def stage(self, name):
+        if not self.timing_hooks:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            for hook in self.timing_hooks:
+                hook(name, seconds)
+
+    def verify(self, token):
+        """Returns the payload of `token` and its permissions as a frozenset,
+        None if it has no permissions claim.
+        """
+        with self.stage("cache"):
+            entry = self.tokens.get(token)
+        if entry is not None:
+            _, kid, key, payload, permissions = entry
+            # a token verified by a key since rotated out is verified again
+            if self.keys.get(kid) is key:
+                return dict(payload), permissions
+            self.tokens.discard(token)
+
+        with self.stage("header"):
+            header, payload, signing_input, signature = self.decode(token)
+        with self.stage("key"):
+            key = self.keys.get(header["kid"])
+        if key is None:
+            raise AuthError(
+                {
+                    "code": "invalid_header",
+                    "description": "Unable to find the appropriate key.",
+                },
+                400,
+            )
+        with self.stage("signature"):
+            try:
+                verified = key.verify(signing_input, signature)
+            except Exception:
+                verified = False
+        if not verified:
+            raise AuthError(
+                {
+                    "code": "invalid_header",
+                    "description": "Unable to parse authentication token.",
+                },
+                400,
+            )
+        with self.stage("claims"):
+            self.check_claims(payload)
+            permissions = claimed_permissions(payload)
+
+        self.tokens.put(token, header["kid"], key, dict(payload))
+        return payload, permissions
+
+    def verify_decode_jwt(self, token):
+        return self.verify(token)[0]
+
+    def decode(self, token):
+        """Returns the header, payload, signing input and signature of
+        `token`, without verifying it.
+        """
+        try:
+            header_segment, payload_segment, signature_segment = token.split(".")
+            header = json.loads(b64decode(header_segment))
+        except Exception:
+            raise AuthError(
+                {"code": "invalid_header", "description": "Authorization malformed."},
+                401,
+            )
+        if not isinstance(header, dict) or not isinstance(header.get("kid"), str):
+            raise AuthError(
+                {"code": "invalid_header", "description": "Authorization malformed."},
+                401,
+            )
+        try:
+            if header.get("alg") not in self.algorithms:
+                raise ValueError(header.get("alg"))
+            payload = json.loads(b64decode(payload_segment))
+            if not isinstance(payload, dict):
+                raise ValueError(payload)
+            signature = b64decode(signature_segment)
+        except Exception:
+            raise AuthError(
+                {
+                    "code": "invalid_header",
+                    "description": "Unable to parse authentication token.",
+                },
+                400,
+            )
+        signing_input = f"{header_segment}.{payload_segment}".encode()
+        return header, payload, signing_input, signature
+
+    def check_claims(self, payload):
+        now = time.time()
+        try:
+            if "exp" in payload and float(payload["exp"]) < now - self.leeway:
+                raise AuthError(
+                    {"code": "token_expired", "description": "Token expired."}, 401
+                )
+            if "nbf" in payload and float(payload["nbf"]) > now + self.leeway:
+                raise ValueError("nbf")
+            audience = payload.get("aud")
+            if isinstance(audience, str):
+                audience = [audience]
+            if not isinstance(audience, list) or self.audience not in audience:
+                raise ValueError("aud")
+            if payload.get("iss") != self.issuer:
+                raise ValueError("iss")
+        except (TypeError, ValueError):
+            raise AuthError(
+                {
+                    "code": "invalid_claims",
+                    "description": "Incorrect claims. Please, check the audience and issuer.",
+                },
+                401,
+            )
+
+    def check_permissions(self, required, permissions):
+        """Checks that the frozenset `permissions` of a token has the
+        frozenset `required`.
+        """
+        if permissions is None:
+            raise AuthError(
+                {
+                    "code": "invalid_claims",
+                    "description": "Permissions not included in JWT.",
+                },
+                400,
+            )
+        if not required <= permissions:
+            raise AuthError(
+                {"code": "unauthorized", "description": "Permission not found."}, 403
+            )
+
+    def requires_auth(self, permission=""):
+        """Decorates a view that needs a token with `permission`, a permission
+        or an iterable of permissions all needed; the view is passed the
+        payload of the token.
+        """
+        required = permission_set(permission)
+
+        def requires_auth_decorator(f):
+            @wraps(f)
+            def wrapper(*args, **kwargs):
+                token = get_token_auth_header()
+                payload, permissions = self.verify(token)
+                self.check_permissions(required, permissions)
+                return f(payload, *args, **kwargs)
+
+            return wrapper
+
+        return requires_auth_decorator
@@ -0,0 +1,127 @@
+"""Database configuration shared by the FSND Flask apps.
+
+The connection pool is configured from the environment:
+
+    DATABASE_URL          overrides the default database URI of the app
+    DB_POOL_SIZE          connections kept open (5)
+    DB_MAX_OVERFLOW       extra connections opened under load (10)
+    DB_POOL_TIMEOUT       seconds to wait for a connection (30)
+    DB_POOL_RECYCLE       seconds after which a connection is replaced (1800)
+    DB_POOL_PRE_PING      1 to test connections before using them (1)
+    DB_STATEMENT_TIMEOUT  PostgreSQL statement timeout in ms, 0 for none (0)
+"""
+import os
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+class PoolMetrics:
+    """Checkout counters of a connection pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.wait_seconds = 0.0
+            self.max_wait_seconds = 0.0
+
+    def record(self, wait_seconds, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds += wait_seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+
+    def snapshot(self):
+        with self._lock:
+            waits = self.checkouts + self.timeouts
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": self.wait_seconds / waits * 1000 if waits else 0.0,
+                "max_wait_ms": self.max_wait_seconds * 1000,
+            }
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool recording how long every checkout waited for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except TimeoutError:
+            self.metrics.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.metrics.record(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def database_uri(default):
+    """Returns DATABASE_URL, or `default`, spelled the way SQLAlchemy expects."""
+    uri = os.environ.get("DATABASE_URL", default)
+    if uri.startswith("postgres://"):
+        uri = "postgresql://" + uri[len("postgres://") :]
+    return uri
+
+
+def engine_options(uri, environ=os.environ):
+    """Returns the SQLALCHEMY_ENGINE_OPTIONS for `uri` from the environment."""
+    if uri in ("sqlite://", "sqlite:///:memory:"):
+        # in-memory databases live in a single connection
+        return {}
+    options = {
+        "poolclass": MeteredQueuePool,
+        "pool_size": int(environ.get("DB_POOL_SIZE", 5)),
+        "max_overflow": int(environ.get("DB_MAX_OVERFLOW", 10)),
+        "pool_timeout": float(environ.get("DB_POOL_TIMEOUT", 30)),
+        "pool_recycle": int(environ.get("DB_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": environ.get("DB_POOL_PRE_PING", "1") == "1",
+    }
+    statement_timeout = int(environ.get("DB_STATEMENT_TIMEOUT", 0))
+    if uri.startswith("sqlite"):
+        # pooled connections are handed to whichever thread checks them out
+        options["connect_args"] = {"check_same_thread": False}
+    elif statement_timeout and uri.startswith("postgresql"):
+        options["connect_args"] = {
+            "options": f"-c statement_timeout={statement_timeout}"
+        }
+    return options
+
+
+def configure_db(app, uri):
+    """Sets the database URI and connection pool options of `app`."""
+    app.config["SQLALCHEMY_DATABASE_URI"] = uri
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(uri)
+
+
+def pool_status(engine):
+    """Returns the occupation and the checkout metrics of the pool of `engine`."""
+    pool = engine.pool
+    status = {"pool": pool.status()}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(), checked_out=pool.checkedout(), overflow=pool.overflow()
+        )
+    if isinstance(pool, MeteredQueuePool):
+        status.update(pool.metrics.snapshot())
+    return status
@@ -0,0 +1,89 @@
+"""Bulk import helpers shared by the FSND Flask apps.
+
+Files are CSV, or NDJSON when their extension is .ndjson or .jsonl. They
+are streamed one row at a time and handed to the importers in chunks, so
+memory use does not grow with the size of the file; rows that cannot be
+read are rejected on the ImportReport, with their line number, and the
+import goes on.
+"""
+import csv
+import json
+import os
+import time
+from itertools import islice
+
+
+def is_ndjson(path):
+    return os.path.splitext(path)[1] in (".ndjson", ".jsonl")
+
+
+def read_rows(path, report):
+    """Yields the (line number, row) of a CSV or NDJSON file, one at a time.
+
+    The NDJSON lines that are not a JSON object are rejected on the report.
+    """
+    with open(path, newline="") as f:
+        if is_ndjson(path):
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    report.reject(line_no, f"invalid JSON: {e.msg}")
+                    continue
+                if not isinstance(row, dict):
+                    report.reject(line_no, "not a JSON object")
+                    continue
+                yield line_no, row
+        else:
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+
+
+def read_chunks(rows, chunk_size):
+    rows = iter(rows)
+    chunk = list(islice(rows, chunk_size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(rows, chunk_size))
+
+
+class ImportReport:
+    """What an import of `kind` rows did, and how fast.
+
+    `duplicates` counts the rows skipped because they were already
+    imported; it is None, and left out of the summary, for the imports
+    that do not look for duplicates.
+    """
+
+    def __init__(self, kind, duplicates=None):
+        self.kind = kind
+        self.imported = 0
+        self.duplicates = duplicates
+        self.rejected = []
+        self.started = time.perf_counter()
+        self.seconds = 0
+
+    def reject(self, line_no, errors):
+        self.rejected.append((line_no, errors))
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self.started
+        return self
+
+    @property
+    def rows_per_second(self):
+        rows = self.imported + (self.duplicates or 0) + len(self.rejected)
+        return rows / self.seconds if self.seconds else 0
+
+    def __str__(self):
+        duplicates = ""
+        if self.duplicates is not None:
+            duplicates = f"{self.duplicates} duplicates, "
+        return (
+            f"{self.kind}: {self.imported} imported, {duplicates}"
+            f"{len(self.rejected)} rejected in {self.seconds:.2f}s "
+            f"({self.rows_per_second:.0f} rows/s)"
+        )
@@ -0,0 +1,99 @@
+"""Connection pool load test.
+
+Runs `--clients` concurrent clients, each issuing `--requests` queries
+through an engine configured by fsnd_common.db, once per pool size, and
+reports the query latency and the time spent waiting for a connection:
+
+    python -m fsnd_common.loadtest postgresql://localhost:5432/trivia \
+        --pool-sizes 1,5,10,20 --clients 50 --query "SELECT pg_sleep(0.01)"
+"""
+import argparse
+import statistics
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+
+from fsnd_common.db import engine_options, pool_status
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def run(uri, pool_size, clients, requests, query):
+    environ = {"DB_POOL_SIZE": str(pool_size), "DB_MAX_OVERFLOW": "0"}
+    engine = create_engine(uri, **engine_options(uri, environ))
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def client():
+        for _ in range(requests):
+            started = time.perf_counter()
+            try:
+                with engine.connect() as connection:
+                    connection.execute(text(query)).fetchall()
+            except Exception as e:
+                with lock:
+                    errors.append(e)
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+    status = pool_status(engine)
+    engine.dispose()
+
+    result = {
+        "pool_size": pool_size,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "throughput": len(latencies) / seconds if seconds else 0.0,
+        "avg_wait_ms": status["avg_wait_ms"],
+        "max_wait_ms": status["max_wait_ms"],
+    }
+    if latencies:
+        result.update(
+            p50_ms=percentile(latencies, 50) * 1000,
+            p95_ms=percentile(latencies, 95) * 1000,
+            p99_ms=percentile(latencies, 99) * 1000,
+            mean_ms=statistics.mean(latencies) * 1000,
+        )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("uri")
+    parser.add_argument("--pool-sizes", default="1,5,10,20")
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--query", default="SELECT 1")
+    args = parser.parse_args()
+
+    print(
+        f"{'pool':>4} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+        f"{'wait ms':>8} {'errors':>6}"
+    )
+    for pool_size in map(int, args.pool_sizes.split(",")):
+        r = run(args.uri, pool_size, args.clients, args.requests, args.query)
+        # every query failed: there are no latencies to report
+        nan = float("nan")
+        print(
+            f"{r['pool_size']:>4} {r['throughput']:>8.0f} "
+            f"{r.get('p50_ms', nan):>8.2f} {r.get('p95_ms', nan):>8.2f} "
+            f"{r.get('p99_ms', nan):>8.2f} {r['avg_wait_ms']:>8.2f} "
+            f"{r['errors']:>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
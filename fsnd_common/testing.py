@@ -0,0 +1,123 @@
+"""Database test harness shared by the FSND Flask apps.
+
+The schema is created once per test process, then every test runs inside
+a transaction rolled back by tearDown: the app commits to SAVEPOINTs that
+are restarted after every commit or rollback, so tests see their own
+writes but never those of other tests.
+
+Under pytest-xdist (`pytest -n auto`) every worker process gets its own
+database: in-memory SQLite databases already are, SQLite files get the
+worker name appended and PostgreSQL databases use a schema per worker.
+"""
+import os
+import re
+import unittest
+
+from sqlalchemy import event, text
+
+from fsnd_common.db import engine_options
+
+
+def worker_name():
+    """Returns the pytest-xdist worker running the tests, like gw0, or None."""
+    return os.environ.get("PYTEST_XDIST_WORKER")
+
+
+def worker_db_config(uri):
+    """Returns the config of an app using the database of the current test
+    worker, to pass to an app factory or to `app.config.update`.
+    """
+    if uri.startswith("postgres://"):
+        uri = "postgresql://" + uri[len("postgres://") :]
+    worker = worker_name()
+    if worker and uri.startswith("sqlite:///") and uri != "sqlite:///:memory:":
+        uri = re.sub(r"(\.\w+)?$", rf"_{worker}\g<1>", uri, count=1)
+    options = engine_options(uri)
+    if worker and uri.startswith("postgresql"):
+        connect_args = options.setdefault("connect_args", {})
+        connect_args["options"] = (
+            connect_args.get("options", "") + f" -c search_path={worker}"
+        ).strip()
+    return {
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": uri,
+        "SQLALCHEMY_TRACK_MODIFICATIONS": False,
+        "SQLALCHEMY_ENGINE_OPTIONS": options,
+    }
+
+
+def configure_test_db(app, uri):
+    """Configures `app` to use the database of the current test worker."""
+    app.config.update(worker_db_config(uri))
+
+
+def _sqlite_begin(conn):
+    # pysqlite only opens a transaction before DML, so the SAVEPOINTs would
+    # end up outside of it; take the transactions over from the driver
+    dbapi_connection = conn.connection
+    dbapi_connection = getattr(dbapi_connection, "dbapi_connection", None) or (
+        dbapi_connection.connection
+    )
+    dbapi_connection.isolation_level = None
+    getattr(conn, "exec_driver_sql", conn.execute)("BEGIN")
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Runs every test in a transaction rolled back at the end of the test.
+
+    Subclasses set `app` and `db`, and override `create_schema` to seed the
+    data shared by all the tests; `app` must already be configured, see
+    `configure_test_db`.
+    """
+
+    app = None
+    db = None
+    # engines whose schema was created by this process
+    _schemas = set()
+
+    @classmethod
+    def create_schema(cls):
+        cls.db.drop_all()
+        cls.db.create_all()
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with cls.app.app_context():
+            engine = cls.db.get_engine(cls.app)
+            if engine in DatabaseTestCase._schemas:
+                return
+            if engine.dialect.name == "sqlite":
+                event.listen(engine, "begin", _sqlite_begin)
+            worker = worker_name()
+            if worker and engine.dialect.name == "postgresql":
+                with engine.begin() as connection:
+                    connection.execute(text(f"CREATE SCHEMA IF NOT EXISTS {worker}"))
+            cls.create_schema()
+            cls.db.session.commit()
+            cls.db.session.remove()
+            DatabaseTestCase._schemas.add(engine)
+
+    def setUp(self):
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.connection = self.db.engine.connect()
+        self.transaction = self.connection.begin()
+        self.savepoint = self.connection.begin_nested()
+
+        self._session = self.db.session
+        self.db.session = self.db.create_scoped_session(
+            options={"bind": self.connection, "binds": {}}
+        )
+        event.listen(self.db.session, "after_transaction_end", self._restart_savepoint)
+
+    def _restart_savepoint(self, session, transaction):
+        if not self.savepoint.is_active:
+            self.savepoint = self.connection.begin_nested()
+
+    def tearDown(self):
+        self.db.session.remove()
+        self.db.session = self._session
+        self.transaction.rollback()
+        self.connection.close()
+        self.app_context.pop()
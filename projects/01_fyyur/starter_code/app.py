@@ -4,17 +4,34 @@
 
 import sys
 import json
+import click
 import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
+from itertools import groupby, islice
+from flask import (
+    Flask,
+    render_template,
+    request,
+    Response,
+    flash,
+    redirect,
+    url_for,
+    jsonify,
+    abort,
+)
+from flask.cli import AppGroup
 from flask_moment import Moment
 from flask_migrate import Migrate
-from sqlalchemy import func
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import joinedload
 import logging
 from logging import Formatter, FileHandler
 from flask_wtf import Form
 from forms import *
-from models import db, Venue, Artist, Show
+from models import db, Venue, Artist, Show, Genre
+from directory import area_directory
+from filters import format_datetime, format_datetimes
+from importer import Importer, CHUNK_SIZE
+from search import venue_search, artist_search
 
 # ----------------------------------------------------------------------------#
 # App Config.
@@ -26,19 +43,20 @@ app.config.from_object("config")
 db.init_app(app)
 migrate = Migrate(app, db)
 
-# ----------------------------------------------------------------------------#
-# Filters.
-# ----------------------------------------------------------------------------#
 
+@app.before_request
+def start_area_directory_reconciler():
+    # started by the server rather than on import, so that the tests and the
+    # flask commands importing the app do not run it
+    if not app.testing:
+        area_directory.start_reconciler(
+            app, app.config["AREA_DIRECTORY_RECONCILE_INTERVAL"]
+        )
 
-def format_datetime(value, format="medium"):
-    date = dateutil.parser.parse(value)
-    if format == "full":
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == "medium":
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format)
 
+# ----------------------------------------------------------------------------#
+# Filters.
+# ----------------------------------------------------------------------------#
 
 app.jinja_env.filters["datetime"] = format_datetime
 
@@ -58,71 +76,97 @@ def index():
 
 @app.route("/venues")
 def venues():
-    areas = Venue.query.with_entities(
-        Venue.city, Venue.state, func.count(Venue.id)
-    ).group_by(Venue.city, Venue.state)
-
-    data = []
-    for area in areas:
-        city = area[0]
-        state = area[1]
-        venues_for_area = Venue.query.filter_by(city=city).filter_by(state=state).all()
-        venues_by_location = {
+    genre = request.args.get("genre")
+    return render_template(
+        "pages/venues.html",
+        areas=get_venues_by_genre(genre) if genre else area_directory.areas(),
+        upcoming_shows_count=get_upcoming_shows_count(),
+    )
+
+
+def get_venues_by_genre(genre):
+    """Returns the venues playing `genre` grouped by city and state."""
+    venues_records = (
+        db.session.query(Venue.id, Venue.name, Venue.city, Venue.state)
+        .join(Venue.genres)
+        .filter(Genre.name == genre)
+        .order_by(Venue.city, Venue.state, Venue.id)
+    )
+    return [
+        {
             "city": city,
             "state": state,
-            "venues": [{"id": v.id, "name": v.name,} for v in venues_for_area],
+            "venues": [{"id": v.id, "name": v.name} for v in venues_for_area],
         }
-        data.append(venues_by_location)
-    return render_template("pages/venues.html", areas=data)
+        for (city, state), venues_for_area in groupby(
+            venues_records, key=lambda v: (v.city, v.state)
+        )
+    ]
+
+
+def get_upcoming_shows_count():
+    """Returns the number of upcoming shows of every venue, in one query."""
+    return dict(
+        db.session.query(Show.venue_id, func.count(Show.id))
+        .filter(Show.start_time >= datetime.now())
+        .group_by(Show.venue_id)
+    )
 
 
 @app.route("/venues/search", methods=["POST"])
 def search_venues():
     search_term = request.form.get("search_term", "")
-    results = Venue.query.filter(Venue.name.ilike(f"%{search_term}%")).all()
-    data = [{"id": result.id, "name": result.name} for result in results]
-    response = {"count": len(results), "data": data}
+    page = request.args.get("page", 1, type=int)
+    response = venue_search.search(search_term, page)
 
     return render_template(
-        "pages/search_venues.html",
-        results=response,
-        search_term=request.form.get("search_term", ""),
+        "pages/search_venues.html", results=response, search_term=search_term,
     )
 
 
 @app.route("/venues/<int:venue_id>")
 def show_venue(venue_id):
-    data = Venue.query.get(venue_id)
-    data.genres = data.genres.split(",")
-    past_shows = get_venues_shows(venue_id)
+    data = (
+        Venue.query.options(
+            joinedload(Venue.genres),
+            joinedload(Venue.shows)
+            .joinedload(Show.artist)
+            .load_only("id", "name", "image_link")
+        )
+        .filter(Venue.id == venue_id)
+        .first_or_404()
+    )
+    past_shows, upcoming_shows = get_venues_shows(data, datetime.now())
     data.past_shows = past_shows
     data.past_shows_count = len(past_shows)
-    upcoming_shows = get_venues_shows(venue_id, True)
     data.upcoming_shows = upcoming_shows
     data.upcoming_shows_count = len(upcoming_shows)
     return render_template("pages/show_venue.html", venue=data)
 
 
-def get_venues_shows(venue_id, upcoming=False):
-    shows_records = (
-        Show.query.join(Artist)
-        .filter(Show.venue_id == venue_id)
-        .filter(
-            Show.start_time < datetime.now()
-            if not upcoming
-            else Show.start_time >= datetime.now()
+def get_venues_shows(venue, now):
+    """Splits the already loaded shows of `venue` into past and upcoming."""
+    past_shows = []
+    upcoming_shows = []
+    for show in sorted(venue.shows, key=lambda show: show.start_time):
+        shows = upcoming_shows if show.start_time >= now else past_shows
+        shows.append(
+            {
+                "artist_id": show.artist_id,
+                "artist_name": show.artist.name,
+                "artist_image_link": show.artist.image_link,
+                "start_time": show.start_time,
+            }
         )
-        .all()
-    )
-    shows = [
-        {
-            "artist_id": show.artist_id,
-            "artist_name": show.artist.name,
-            "artist_image_link": show.artist.image_link,
-            "start_time": show.start_time.strftime("%Y-%m-%d %H:%M:%S"),
-        }
-        for show in shows_records
-    ]
+    format_start_times(past_shows + upcoming_shows)
+    return past_shows, upcoming_shows
+
+
+def format_start_times(shows):
+    """Adds the formatted start time of every show, formatted all at once."""
+    times = format_datetimes([show["start_time"] for show in shows], "full")
+    for show, formatted in zip(shows, times):
+        show["formatted_start_time"] = formatted
     return shows
 
 
@@ -142,8 +186,7 @@ def create_venue_submission():
         state = request.form.get("state")
         address = request.form.get("address")
         phone = request.form.get("phone")
-        genres = request.form.getlist("genres")
-        comma_separated_genres = ",".join(genres)
+        genres = Genre.from_names(request.form.getlist("genres"))
         image_link = request.form.get("image_link")
         facebook_link = request.form.get("facebook_link")
         website_link = request.form.get("website_link")
@@ -155,7 +198,7 @@ def create_venue_submission():
             state=state,
             address=address,
             phone=phone,
-            genres=comma_separated_genres,
+            genres=genres,
             image_link=image_link,
             facebook_link=facebook_link,
             website_link=website_link,
@@ -164,6 +207,8 @@ def create_venue_submission():
         )
         db.session.add(venue)
         db.session.commit()
+        area_directory.add(venue.id, venue.name, venue.city, venue.state)
+        venue_search.invalidate()
     except:
         error = True
         db.session.rollback()
@@ -182,30 +227,46 @@ def create_venue_submission():
 # End Create Venue
 
 
-@app.route("/venues/<venue_id>", methods=["DELETE"])
+@app.route("/venues/<int:venue_id>", methods=["DELETE"])
 def delete_venue(venue_id):
-    # TODO: Complete this endpoint for taking a venue_id, and using
-    # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
+    venue = Venue.query.get_or_404(venue_id)
+    error = False
+    try:
+        db.session.delete(venue)
+        db.session.commit()
+        area_directory.remove(venue_id)
+        venue_search.invalidate()
+    except:
+        error = True
+        db.session.rollback()
+        print(sys.exc_info())
+    finally:
+        db.session.close()
+    if error:
+        abort(500)
 
     # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
     # clicking that button delete it from the db then redirect the user to the homepage
-    return None
+    return jsonify({"success": True})
 
 
 #  Artists
 #  ----------------------------------------------------------------
 @app.route("/artists")
 def artists():
-    data = Artist.query.order_by("name").all()
+    query = Artist.query
+    genre = request.args.get("genre")
+    if genre:
+        query = query.join(Artist.genres).filter(Genre.name == genre)
+    data = query.order_by(Artist.name).all()
     return render_template("pages/artists.html", artists=data)
 
 
 @app.route("/artists/search", methods=["POST"])
 def search_artists():
     search_term = request.form.get("search_term", "")
-    results = Artist.query.filter(Artist.name.ilike(f"%{search_term}%")).all()
-    data = [{"id": result.id, "name": result.name} for result in results]
-    response = {"count": len(results), "data": data}
+    page = request.args.get("page", 1, type=int)
+    response = artist_search.search(search_term, page)
 
     return render_template(
         "pages/search_artists.html", results=response, search_term=search_term
@@ -214,38 +275,40 @@ def search_artists():
 
 @app.route("/artists/<int:artist_id>")
 def show_artist(artist_id):
-    data = Artist.query.get(artist_id)
-    data.genres = data.genres.split(",")
-    past_shows = get_artist_shows(artist_id)
+    data = (
+        Artist.query.options(
+            joinedload(Artist.genres),
+            joinedload(Artist.shows)
+            .joinedload(Show.venue)
+            .load_only("id", "name", "image_link")
+        )
+        .filter(Artist.id == artist_id)
+        .first_or_404()
+    )
+    past_shows, upcoming_shows = get_artist_shows(data, datetime.now())
     data.past_shows = past_shows
     data.past_shows_count = len(past_shows)
-    upcoming_shows = get_artist_shows(artist_id, True)
     data.upcoming_shows = upcoming_shows
     data.upcoming_shows_count = len(upcoming_shows)
     return render_template("pages/show_artist.html", artist=data)
 
 
-def get_artist_shows(artist_id, upcoming=False):
-    shows_records = (
-        Show.query.join(Venue)
-        .filter(Show.artist_id == artist_id)
-        .filter(
-            Show.start_time < datetime.now()
-            if not upcoming
-            else Show.start_time >= datetime.now()
+def get_artist_shows(artist, now):
+    """Splits the already loaded shows of `artist` into past and upcoming."""
+    past_shows = []
+    upcoming_shows = []
+    for show in sorted(artist.shows, key=lambda show: show.start_time):
+        shows = upcoming_shows if show.start_time >= now else past_shows
+        shows.append(
+            {
+                "venue_id": show.venue_id,
+                "venue_name": show.venue.name,
+                "venue_image_link": show.venue.image_link,
+                "start_time": show.start_time,
+            }
         )
-        .all()
-    )
-    shows = [
-        {
-            "venue_id": show.venue_id,
-            "venue_name": show.venue.name,
-            "venue_image_link": show.venue.image_link,
-            "start_time": show.start_time.strftime("%Y-%m-%d %H:%M:%S"),
-        }
-        for show in shows_records
-    ]
-    return shows
+    format_start_times(past_shows + upcoming_shows)
+    return past_shows, upcoming_shows
 
 
 #  Update
@@ -301,8 +364,31 @@ def edit_venue(venue_id):
 
 @app.route("/venues/<int:venue_id>/edit", methods=["POST"])
 def edit_venue_submission(venue_id):
-    # TODO: take values from the form submitted, and update existing
-    # venue record with ID <venue_id> using the new attributes
+    venue = Venue.query.get_or_404(venue_id)
+    error = False
+    try:
+        venue.name = request.form.get("name")
+        venue.city = request.form.get("city")
+        venue.state = request.form.get("state")
+        venue.address = request.form.get("address")
+        venue.phone = request.form.get("phone")
+        venue.genres = Genre.from_names(request.form.getlist("genres"))
+        venue.image_link = request.form.get("image_link") or venue.image_link
+        venue.facebook_link = request.form.get("facebook_link")
+        venue.website_link = request.form.get("website_link")
+        venue.seeking_talent = "seeking_talent" in request.form
+        venue.seeking_description = request.form.get("seeking_description", "")
+        db.session.commit()
+        area_directory.add(venue.id, venue.name, venue.city, venue.state)
+        venue_search.invalidate()
+    except:
+        error = True
+        db.session.rollback()
+        print(sys.exc_info())
+    finally:
+        db.session.close()
+    if error:
+        flash("An error occurred. Venue could not be updated.")
     return redirect(url_for("show_venue", venue_id=venue_id))
 
 
@@ -321,8 +407,7 @@ def create_artist_submission():
         city = request.form.get("city")
         state = request.form.get("state")
         phone = request.form.get("phone")
-        genres = request.form.getlist("genres")
-        comma_separated_genres = ",".join(genres)
+        genres = Genre.from_names(request.form.getlist("genres"))
         image_link = request.form.get("image_link")
         facebook_link = request.form.get("facebook_link")
         website_link = request.form.get("website_link")
@@ -333,7 +418,7 @@ def create_artist_submission():
             city=city,
             state=state,
             phone=phone,
-            genres=comma_separated_genres,
+            genres=genres,
             image_link=image_link,
             facebook_link=facebook_link,
             website_link=website_link,
@@ -342,6 +427,7 @@ def create_artist_submission():
         )
         db.session.add(artist)
         db.session.commit()
+        artist_search.invalidate()
     except:
         error = True
         db.session.rollback()
@@ -366,21 +452,94 @@ def create_artist_submission():
 #  ----------------------------------------------------------------
 
 
+SHOWS_PER_PAGE = 30
+
+
 @app.route("/shows")
 def shows():
-    shows = Show.query.join(Venue).join(Artist).all()
-    data = [
-        {
-            "venue_id": show.venue_id,
-            "venue_name": show.venue.name,
-            "artist_id": show.artist_id,
-            "artist_name": show.artist.name,
-            "artist_image_link": show.artist.image_link,
-            "start_time": show.start_time.strftime("%Y-%m-%d %H:%M:%S"),
-        }
-        for show in shows
-    ]
-    return render_template("pages/shows.html", shows=data)
+    filters = {
+        name: request.args[name]
+        for name in ("upcoming", "since", "until")
+        if request.args.get(name)
+    }
+    query = (
+        db.session.query(
+            Show.id,
+            Show.start_time,
+            Show.venue_id,
+            Venue.name.label("venue_name"),
+            Show.artist_id,
+            Artist.name.label("artist_name"),
+            Artist.image_link.label("artist_image_link"),
+        )
+        .join(Venue, Venue.id == Show.venue_id)
+        .join(Artist, Artist.id == Show.artist_id)
+    )
+    try:
+        if filters.get("upcoming") == "1":
+            query = query.filter(Show.start_time >= datetime.now())
+        if "since" in filters:
+            query = query.filter(
+                Show.start_time >= dateutil.parser.parse(filters["since"])
+            )
+        if "until" in filters:
+            query = query.filter(
+                Show.start_time < dateutil.parser.parse(filters["until"])
+            )
+        if request.args.get("after"):
+            start_time, show_id = parse_shows_cursor(request.args["after"])
+            query = query.filter(
+                tuple_(Show.start_time, Show.id) > tuple_(start_time, show_id)
+            )
+    except ValueError:
+        abort(400)
+
+    rows = (
+        query.order_by(Show.start_time, Show.id)
+        .limit(SHOWS_PER_PAGE + 1)
+        .yield_per(SHOWS_PER_PAGE)
+    )
+    return render_template(
+        "pages/shows.html", shows=ShowsPage(rows, SHOWS_PER_PAGE), filters=filters
+    )
+
+
+def parse_shows_cursor(cursor):
+    start_time, show_id = cursor.rsplit("_", 1)
+    return datetime.fromisoformat(start_time), int(show_id)
+
+
+class ShowsPage:
+    """One page of the shows listing.
+
+    The rows of the page are fetched when the template iterates over it,
+    and their start times formatted at once. The cursor of the next page is
+    known once the iteration started.
+    """
+
+    def __init__(self, rows, per_page):
+        self.rows = rows
+        self.per_page = per_page
+        self.next_cursor = None
+
+    def __iter__(self):
+        rows = list(islice(self.rows, self.per_page + 1))
+        if len(rows) > self.per_page:
+            last_show = rows[self.per_page - 1]
+            self.next_cursor = f"{last_show.start_time.isoformat()}_{last_show.id}"
+            rows = rows[: self.per_page]
+        shows = [
+            {
+                "venue_id": show.venue_id,
+                "venue_name": show.venue_name,
+                "artist_id": show.artist_id,
+                "artist_name": show.artist_name,
+                "artist_image_link": show.artist_image_link,
+                "start_time": show.start_time,
+            }
+            for show in rows
+        ]
+        return iter(format_start_times(shows))
 
 
 # Create Show
@@ -437,6 +596,40 @@ if not app.debug:
     app.logger.addHandler(file_handler)
     app.logger.info("errors")
 
+# ----------------------------------------------------------------------------#
+# Commands.
+# ----------------------------------------------------------------------------#
+
+fyyur_cli = AppGroup("fyyur", help="Fyyur maintenance commands.")
+
+
+@fyyur_cli.command("import")
+@click.option("--venues", type=click.Path(exists=True, dir_okay=False))
+@click.option("--artists", type=click.Path(exists=True, dir_okay=False))
+@click.option("--shows", type=click.Path(exists=True, dir_okay=False))
+@click.option("--chunk-size", default=CHUNK_SIZE, show_default=True)
+def import_command(venues, artists, shows, chunk_size):
+    """Bulk imports venues, artists and shows from CSV or NDJSON files.
+
+    The shows refer to the `id` column of the venues and artists files
+    imported with them, or to existing ids when those are not given.
+    """
+    importer = Importer(chunk_size)
+    reports = []
+    if venues:
+        reports.append(importer.import_venues(venues))
+    if artists:
+        reports.append(importer.import_artists(artists))
+    if shows:
+        reports.append(importer.import_shows(shows))
+    for report in reports:
+        click.echo(report)
+        for line_no, errors in report.rejected:
+            click.echo(f"  line {line_no} rejected: {errors}", err=True)
+
+
+app.cli.add_command(fyyur_cli)
+
 # ----------------------------------------------------------------------------#
 # Launch.
 # ----------------------------------------------------------------------------#
@@ -0,0 +1,43 @@
+"""Micro-benchmark of the datetime template filter on a 10k shows page.
+
+    python benchmark_filters.py
+"""
+import timeit
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+from filters import DATETIME_FORMATS, format_datetime, format_datetimes
+
+SHOWS_N = 10000
+
+
+def format_datetime_uncached(value, format="medium"):
+    """The filter as it was: shows were formatted to strings by the views and
+    parsed back, and Babel compiled the pattern on every call."""
+    date = dateutil.parser.parse(value)
+    return babel.dates.format_datetime(date, DATETIME_FORMATS[format])
+
+
+def main():
+    start = datetime(2035, 4, 1, 20)
+    start_times = [start + timedelta(hours=i % 2000) for i in range(SHOWS_N)]
+    start_time_strings = [t.strftime("%Y-%m-%d %H:%M:%S") for t in start_times]
+
+    runs = {
+        "uncached, from strings": lambda: [
+            format_datetime_uncached(t, "full") for t in start_time_strings
+        ],
+        "format_datetime": lambda: [format_datetime(t, "full") for t in start_times],
+        "format_datetimes": lambda: format_datetimes(start_times, "full"),
+    }
+    baseline = None
+    for name, run in runs.items():
+        seconds = min(timeit.repeat(run, number=1, repeat=3))
+        baseline = baseline or seconds
+        print(f"{name:<24} {seconds * 1000:8.1f} ms  x{baseline / seconds:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 import os
 
+from fsnd_common.db import database_uri, engine_options
+
 SECRET_KEY = os.urandom(32)
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
@@ -8,5 +10,10 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 DEBUG = True
 
 # DATABASE URL
-SQLALCHEMY_DATABASE_URI = "postgres://stefanobettinelli@localhost:5432/fyyur"
+SQLALCHEMY_DATABASE_URI = database_uri("postgres://stefanobettinelli@localhost:5432/fyyur")
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+# Connection pool, see fsnd_common/db.py for the DB_* environment variables
+SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+
+# Seconds between two rebuilds of the in-memory venue area directory, 0 disables
+AREA_DIRECTORY_RECONCILE_INTERVAL = 300
@@ -0,0 +1,156 @@
+import threading
+from itertools import groupby
+
+from models import db, Venue
+
+
+class AreaDirectory:
+    """In-memory directory of the venues grouped by city and state.
+
+    The directory is built from the venue table on first use and then kept
+    up to date by the controllers that create, edit or delete a venue, so
+    listing the areas does not need to hit the database. `reconcile()`
+    rebuilds it from the venue table and reports what had drifted.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._areas = None
+        self._venue_areas = {}
+        self._snapshot = None
+        self._reconciler = None
+
+    @staticmethod
+    def _build():
+        venues_records = db.session.query(
+            Venue.id, Venue.name, Venue.city, Venue.state
+        ).order_by(Venue.city, Venue.state, Venue.id)
+
+        areas = {}
+        venue_areas = {}
+        for area, venues_for_area in groupby(
+            venues_records, key=lambda v: (v.city, v.state)
+        ):
+            venues = areas.setdefault(area, {})
+            for v in venues_for_area:
+                venues[v.id] = v.name
+                venue_areas[v.id] = area
+        return areas, venue_areas
+
+    def _ensure_loaded(self):
+        if self._areas is None:
+            self._areas, self._venue_areas = self._build()
+            self._snapshot = None
+
+    def areas(self):
+        """Returns the list of areas in the format used by the venues page."""
+        with self._lock:
+            self._ensure_loaded()
+            if self._snapshot is None:
+                self._snapshot = [
+                    {
+                        "city": city,
+                        "state": state,
+                        "venues": [
+                            {"id": venue_id, "name": name}
+                            for venue_id, name in sorted(venues.items())
+                        ],
+                    }
+                    for (city, state), venues in sorted(self._areas.items())
+                ]
+            return self._snapshot
+
+    def add(self, venue_id, name, city, state):
+        """Adds a venue, or moves and renames it if it is already listed."""
+        with self._lock:
+            if self._areas is None:
+                return
+            self._discard(venue_id)
+            self._areas.setdefault((city, state), {})[venue_id] = name
+            self._venue_areas[venue_id] = (city, state)
+            self._snapshot = None
+
+    def remove(self, venue_id):
+        with self._lock:
+            if self._areas is None:
+                return
+            self._discard(venue_id)
+            self._snapshot = None
+
+    def _discard(self, venue_id):
+        area = self._venue_areas.pop(venue_id, None)
+        if area is None:
+            return
+        venues = self._areas[area]
+        del venues[venue_id]
+        if not venues:
+            del self._areas[area]
+
+    def invalidate(self):
+        """Drops the directory, it is rebuilt on the next read."""
+        with self._lock:
+            self._areas = None
+            self._venue_areas = {}
+            self._snapshot = None
+
+    def reconcile(self):
+        """Rebuilds the directory from the venue table.
+
+        Returns the ids of the venues that were missing from the directory,
+        listed although they no longer exist, or listed with a stale name or
+        area.
+        """
+        # built under the lock, so that no add() or remove() made while the
+        # venue table is read is overwritten by the new directory
+        with self._lock:
+            areas, venue_areas = self._build()
+            drift = {"missing": [], "stale": [], "changed": []}
+            if self._areas is not None:
+                for venue_id, area in venue_areas.items():
+                    if venue_id not in self._venue_areas:
+                        drift["missing"].append(venue_id)
+                    elif (
+                        self._venue_areas[venue_id] != area
+                        or self._areas[self._venue_areas[venue_id]][venue_id]
+                        != areas[area][venue_id]
+                    ):
+                        drift["changed"].append(venue_id)
+                drift["stale"] = sorted(set(self._venue_areas) - set(venue_areas))
+                drift["missing"].sort()
+                drift["changed"].sort()
+            self._areas, self._venue_areas = areas, venue_areas
+            self._snapshot = None
+        return drift
+
+    def start_reconciler(self, app, interval):
+        """Reconciles the directory every `interval` seconds in the background,
+        logging any drift found. Starts one thread at most, and returns the
+        event stopping it."""
+        if not interval or self._reconciler is not None:
+            return self._reconciler
+        with self._lock:
+            if self._reconciler is not None:
+                return self._reconciler
+            stopped = self._reconciler = threading.Event()
+
+        def run():
+            while not stopped.wait(interval):
+                with app.app_context():
+                    try:
+                        drift = self.reconcile()
+                    except Exception:
+                        app.logger.exception("area directory reconciliation failed")
+                        continue
+                    finally:
+                        db.session.remove()
+                    if any(drift.values()):
+                        app.logger.warning("area directory drift: %s", drift)
+
+        thread = threading.Thread(
+            target=run, name="area-directory-reconciler", daemon=True
+        )
+        thread.start()
+        return stopped
+
+
+area_directory = AreaDirectory()
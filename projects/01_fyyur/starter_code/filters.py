@@ -0,0 +1,49 @@
+from datetime import datetime
+from functools import lru_cache
+
+import babel
+import babel.dates
+import dateutil.parser
+
+DATETIME_FORMATS = {
+    "full": "EEEE MMMM, d, y 'at' h:mma",
+    "medium": "EE MM, dd, y h:mma",
+}
+
+
+@lru_cache(maxsize=64)
+def get_datetime_pattern(format, locale):
+    """Returns the compiled Babel pattern and the locale for `format`."""
+    pattern = babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format))
+    return pattern, babel.Locale.parse(locale)
+
+
+def format_datetime(value, format="medium", locale=None):
+    """Formats a datetime, or a string holding one, for the templates.
+
+    The Babel pattern is compiled once per (format, locale); datetime
+    objects are formatted without going through the parser.
+    """
+    if not isinstance(value, datetime):
+        value = dateutil.parser.parse(value)
+    pattern, locale = get_datetime_pattern(format, locale or babel.dates.LC_TIME)
+    return pattern.apply(value, locale)
+
+
+def format_datetimes(values, format="medium", locale=None):
+    """Formats a list of datetimes at once.
+
+    The pattern is looked up once for the whole list and repeated values,
+    like shows starting at the same time, are only formatted once.
+    """
+    pattern, locale = get_datetime_pattern(format, locale or babel.dates.LC_TIME)
+    formatted = {}
+    results = []
+    for value in values:
+        if value not in formatted:
+            date = value
+            if not isinstance(date, datetime):
+                date = dateutil.parser.parse(date)
+            formatted[value] = pattern.apply(date, locale)
+        results.append(formatted[value])
+    return results
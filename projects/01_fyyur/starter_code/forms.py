@@ -7,7 +7,7 @@ from wtforms import (
     DateTimeField,
     BooleanField,
 )
-from wtforms.validators import DataRequired, AnyOf, URL
+from wtforms.validators import DataRequired, AnyOf, URL, Optional
 
 
 class ShowForm(Form):
@@ -107,10 +107,10 @@ class VenueForm(Form):
             ("Other", "Other"),
         ],
     )
-    website_link = StringField("website_link", validators=[URL()])
-    facebook_link = StringField("facebook_link", validators=[URL()])
+    website_link = StringField("website_link", validators=[Optional(), URL()])
+    facebook_link = StringField("facebook_link", validators=[Optional(), URL()])
     seeking_talent = BooleanField("seeking_talent")
-    seeking_description = StringField("seeking_description", validators=[URL()])
+    seeking_description = StringField("seeking_description")
 
 
 class ArtistForm(Form):
@@ -203,15 +203,15 @@ class ArtistForm(Form):
             ("Other", "Other"),
         ],
     )
-    website_link = StringField("website_link", validators=[URL()])
-    image_link = StringField("image_link", validators=[URL()])
+    website_link = StringField("website_link", validators=[Optional(), URL()])
+    image_link = StringField("image_link", validators=[Optional(), URL()])
     facebook_link = StringField(
         # TODO implement enum restriction
         "facebook_link",
-        validators=[URL()],
+        validators=[Optional(), URL()],
     )
     seeking_venue = BooleanField("seeking_venue")
-    seeking_description = StringField("seeking_description", validators=[URL()])
+    seeking_description = StringField("seeking_description")
 
 
 # TODO IMPLEMENT NEW ARTIST FORM AND NEW SHOW FORM
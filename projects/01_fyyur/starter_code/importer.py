@@ -0,0 +1,199 @@
+from sqlalchemy import func, text
+from sqlalchemy.exc import IntegrityError
+from werkzeug.datastructures import MultiDict
+
+from fsnd_common.importing import ImportReport, read_chunks, read_rows
+
+from forms import VenueForm, ArtistForm, ShowForm
+from models import db, Venue, Artist, Show, Genre, venue_genre, artist_genre
+
+CHUNK_SIZE = 1000
+
+
+def reserve_ids(model, count):
+    """Returns `count` new ids for `model`, so that its rows can be inserted
+    with one executemany instead of one INSERT per row to get their ids back.
+
+    On PostgreSQL the ids are taken from the sequence of the table. Other
+    databases get the ids following the largest one, which holds as long as
+    a single import writes to the table at a time.
+    """
+    if db.engine.dialect.name == "postgresql":
+        rows = db.session.execute(
+            text(
+                "SELECT nextval(pg_get_serial_sequence(:table, 'id')) "
+                "FROM generate_series(1, :count)"
+            ),
+            {"table": model.__tablename__, "count": count},
+        )
+        return [id for id, in rows]
+    start = (db.session.query(func.max(model.id)).scalar() or 0) + 1
+    return list(range(start, start + count))
+
+
+def to_formdata(row):
+    """Turns a CSV or NDJSON row into the form data the web forms receive."""
+    formdata = MultiDict()
+    for name, value in row.items():
+        if value is None:
+            continue
+        if name == "genres":
+            values = value.split(",") if isinstance(value, str) else value
+            formdata.setlist(name, [genre.strip() for genre in values])
+        elif isinstance(value, bool):
+            formdata.add(name, "y" if value else "")
+        else:
+            formdata.add(name, str(value))
+    return formdata
+
+
+class Importer:
+    """Bulk loads venues, artists and shows from CSV or NDJSON files.
+
+    Rows are validated with the same forms as the web pages and inserted
+    with bulk_insert_mappings, one transaction per chunk. The `id` column of
+    the venue and artist files is only used to resolve the `venue_id` and
+    `artist_id` of the shows file; when no venue or artist file is given,
+    the shows refer to the ids already in the database.
+    """
+
+    def __init__(self, chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.venue_ids = None
+        self.artist_ids = None
+        self.genre_ids = {
+            name: id for id, name in db.session.query(Genre.id, Genre.name)
+        }
+
+    def import_venues(self, path):
+        self.venue_ids = {}
+        return self._import_entities(
+            Venue, VenueForm, venue_genre, "venue_id", path, self.venue_ids
+        )
+
+    def import_artists(self, path):
+        self.artist_ids = {}
+        return self._import_entities(
+            Artist, ArtistForm, artist_genre, "artist_id", path, self.artist_ids
+        )
+
+    def import_shows(self, path):
+        if self.venue_ids is None:
+            self.venue_ids = {str(id): id for id, in db.session.query(Venue.id)}
+        if self.artist_ids is None:
+            self.artist_ids = {str(id): id for id, in db.session.query(Artist.id)}
+
+        report = ImportReport("shows")
+        seen = set()
+        for chunk in read_chunks(read_rows(path, report), self.chunk_size):
+            mappings = []
+            for line_no, row in chunk:
+                form = ShowForm(formdata=to_formdata(row), meta={"csrf": False})
+                if not form.validate():
+                    report.reject(line_no, form.errors)
+                    continue
+                venue_id = self.venue_ids.get(form.venue_id.data)
+                artist_id = self.artist_ids.get(form.artist_id.data)
+                if venue_id is None or artist_id is None:
+                    report.reject(line_no, {"show": ["Unknown artist or venue."]})
+                    continue
+                key = (artist_id, venue_id, form.start_time.data)
+                if key in seen:
+                    report.reject(line_no, {"show": ["Duplicated show."]})
+                    continue
+                seen.add(key)
+                mappings.append(
+                    (
+                        line_no,
+                        {
+                            "artist_id": artist_id,
+                            "venue_id": venue_id,
+                            "start_time": form.start_time.data,
+                        },
+                    )
+                )
+            self._insert_shows(mappings, report)
+        return report.finish()
+
+    def _insert_shows(self, mappings, report):
+        try:
+            db.session.bulk_insert_mappings(Show, [m for _, m in mappings])
+            db.session.commit()
+            report.imported += len(mappings)
+            return
+        except IntegrityError:
+            db.session.rollback()
+        # some shows of the chunk already exist: insert them one by one
+        for line_no, mapping in mappings:
+            try:
+                db.session.bulk_insert_mappings(Show, [mapping])
+                db.session.commit()
+                report.imported += 1
+            except IntegrityError:
+                db.session.rollback()
+                report.reject(line_no, {"show": ["Show already listed."]})
+
+    def _import_entities(self, model, form_class, genre_table, key, path, ids):
+        report = ImportReport(model.__tablename__ + "s")
+        # every mapping has every column, NULLs included, so that a chunk is
+        # inserted with one executemany
+        defaults = {
+            column.name: (
+                column.default.arg
+                if column.default is not None and column.default.is_scalar
+                else None
+            )
+            for column in model.__table__.columns
+            if column.name != "id"
+        }
+        for chunk in read_chunks(read_rows(path, report), self.chunk_size):
+            rows = []
+            for line_no, row in chunk:
+                form = form_class(formdata=to_formdata(row), meta={"csrf": False})
+                if not form.validate():
+                    report.reject(line_no, form.errors)
+                    continue
+                mapping = dict(defaults)
+                mapping.update(
+                    (name, value)
+                    for name, value in form.data.items()
+                    if name in defaults and value not in ("", None)
+                )
+                rows.append((row.get("id"), form.genres.data, mapping))
+
+            if not rows:
+                continue
+            self._add_genres(genres for _, genres, _ in rows)
+            mappings = [mapping for _, _, mapping in rows]
+            for mapping, id in zip(mappings, reserve_ids(model, len(mappings))):
+                mapping["id"] = id
+            db.session.bulk_insert_mappings(model, mappings, render_nulls=True)
+            db.session.execute(
+                genre_table.insert(),
+                [
+                    {key: mapping["id"], "genre_id": self.genre_ids[genre]}
+                    for _, genres, mapping in rows
+                    for genre in set(genres)
+                ],
+            )
+            db.session.commit()
+            for source_id, _, mapping in rows:
+                if source_id is not None:
+                    ids[str(source_id)] = mapping["id"]
+            report.imported += len(rows)
+        return report.finish()
+
+    def _add_genres(self, genres_lists):
+        missing = {
+            genre
+            for genres in genres_lists
+            for genre in genres
+            if genre not in self.genre_ids
+        }
+        if missing:
+            mappings = [
+                {"id": id, "name": name}
+                for id, name in zip(reserve_ids(Genre, len(missing)), sorted(missing))
+            ]
+            db.session.bulk_insert_mappings(Genre, mappings)
+            self.genre_ids.update((m["name"], m["id"]) for m in mappings)
@@ -0,0 +1,78 @@
+"""normalized genres
+
+Revision ID: 17e2f36c61f1
+Revises: 1e9da4f1caf9
+Create Date: 2020-07-19 11:03:27.120934
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '17e2f36c61f1'
+down_revision = '1e9da4f1caf9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_index('ix_genre_name_trgm', 'genre', ['name'], postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    for table in ['venue', 'artist']:
+        op.create_table('{}_genre'.format(table),
+        sa.Column('{}_id'.format(table), sa.Integer(), nullable=False),
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['{}_id'.format(table)], ['{}.id'.format(table)], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['genre_id'], ['genre.id'], ),
+        sa.PrimaryKeyConstraint('{}_id'.format(table), 'genre_id')
+        )
+        op.create_index('ix_{0}_genre_genre_id_{0}_id'.format(table), '{}_genre'.format(table), ['genre_id', '{}_id'.format(table)])
+
+    # backfill from the comma separated genres columns
+    op.execute("""
+        INSERT INTO genre (name)
+        SELECT DISTINCT trim(g.name)
+        FROM (
+            SELECT unnest(string_to_array(genres, ',')) AS name FROM venue
+            UNION
+            SELECT unnest(string_to_array(genres, ',')) AS name FROM artist
+        ) AS g
+        WHERE trim(g.name) <> ''
+    """)
+    for table in ['venue', 'artist']:
+        op.execute("""
+            INSERT INTO {0}_genre ({0}_id, genre_id)
+            SELECT DISTINCT t.id, genre.id
+            FROM {0} AS t
+            CROSS JOIN LATERAL unnest(string_to_array(t.genres, ',')) AS g(name)
+            JOIN genre ON genre.name = trim(g.name)
+        """.format(table))
+        op.drop_index('ix_{}_genres_trgm'.format(table), table_name=table)
+        op.drop_column(table, 'genres')
+
+
+def downgrade():
+    for table in ['venue', 'artist']:
+        op.add_column(table, sa.Column('genres', sa.VARCHAR(length=500), server_default='', nullable=False))
+        op.execute("""
+            UPDATE {0} AS t
+            SET genres = g.genres
+            FROM (
+                SELECT {0}_genre.{0}_id AS id, string_agg(genre.name, ',' ORDER BY genre.name) AS genres
+                FROM {0}_genre JOIN genre ON genre.id = {0}_genre.genre_id
+                GROUP BY {0}_genre.{0}_id
+            ) AS g
+            WHERE t.id = g.id
+        """.format(table))
+        op.alter_column(table, 'genres', server_default=None)
+        op.create_index('ix_{}_genres_trgm'.format(table), table, ['genres'], postgresql_using='gin', postgresql_ops={'genres': 'gin_trgm_ops'})
+        op.drop_index('ix_{0}_genre_genre_id_{0}_id'.format(table), table_name='{}_genre'.format(table))
+        op.drop_table('{}_genre'.format(table))
+    op.drop_index('ix_genre_name_trgm', table_name='genre')
+    op.drop_table('genre')
@@ -0,0 +1,37 @@
+"""trigram search indexes
+
+Revision ID: 1e9da4f1caf9
+Revises: accc2a878095
+Create Date: 2020-07-18 16:12:40.518273
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1e9da4f1caf9'
+down_revision = 'accc2a878095'
+branch_labels = None
+depends_on = None
+
+SEARCHED_COLUMNS = ['name', 'city', 'state', 'genres']
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in ['venue', 'artist']:
+        for column in SEARCHED_COLUMNS:
+            op.create_index(
+                'ix_{}_{}_trgm'.format(table, column),
+                table,
+                [column],
+                postgresql_using='gin',
+                postgresql_ops={column: 'gin_trgm_ops'},
+            )
+
+
+def downgrade():
+    for table in ['venue', 'artist']:
+        for column in SEARCHED_COLUMNS:
+            op.drop_index('ix_{}_{}_trgm'.format(table, column), table_name=table)
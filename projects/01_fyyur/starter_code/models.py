@@ -2,8 +2,57 @@ from flask_sqlalchemy import SQLAlchemy
 
 db = SQLAlchemy()
 
+venue_genre = db.Table(
+    "venue_genre",
+    db.Column(
+        "venue_id",
+        db.Integer,
+        db.ForeignKey("venue.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    db.Column("genre_id", db.Integer, db.ForeignKey("genre.id"), primary_key=True),
+    db.Index("ix_venue_genre_genre_id_venue_id", "genre_id", "venue_id"),
+)
+
+artist_genre = db.Table(
+    "artist_genre",
+    db.Column(
+        "artist_id",
+        db.Integer,
+        db.ForeignKey("artist.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    db.Column("genre_id", db.Integer, db.ForeignKey("genre.id"), primary_key=True),
+    db.Index("ix_artist_genre_genre_id_artist_id", "genre_id", "artist_id"),
+)
+
+
+class Genre(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+    @classmethod
+    def from_names(cls, names):
+        """Returns the genres called `names`, creating the missing ones."""
+        names = list(dict.fromkeys(name for name in names if name))
+        genres = cls.query.filter(cls.name.in_(names)).all() if names else []
+        existing = {genre.name for genre in genres}
+        return genres + [cls(name=name) for name in names if name not in existing]
+
 
 class Show(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint(
+            "artist_id",
+            "venue_id",
+            "start_time",
+            name="uq_show_artist_id_venue_id_start_time",
+        ),
+        db.Index("ix_show_start_time_id", "start_time", "id"),
+        db.Index("ix_show_venue_id_start_time", "venue_id", "start_time"),
+        db.Index("ix_show_artist_id_start_time", "artist_id", "start_time"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     artist_id = db.Column(db.Integer, db.ForeignKey("artist.id"), nullable=False)
     venue_id = db.Column(db.Integer, db.ForeignKey("venue.id"), nullable=False)
@@ -11,13 +60,19 @@ class Show(db.Model):
 
 
 class Venue(db.Model):
+    __table_args__ = (
+        db.Index("ix_venue_city_state", "city", "state"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
     city = db.Column(db.String(120), nullable=False)
     state = db.Column(db.String(120), nullable=False)
     address = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(120))
-    genres = db.Column(db.String(500), nullable=False)
+    genres = db.relationship(
+        "Genre", secondary=venue_genre, order_by="Genre.name", lazy=True
+    )
     image_link = db.Column(
         db.String(500),
         nullable=False,
@@ -27,19 +82,29 @@ class Venue(db.Model):
     website_link = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean, nullable=False, default=False)
     seeking_description = db.Column(db.String(120), nullable=False, default="")
+    # read only: the shows are written through Show, and deleted with the venue
     artists = db.relationship(
-        "Artist", secondary="show", backref=db.backref("venue", lazy=True)
+        "Artist",
+        secondary="show",
+        viewonly=True,
+        backref=db.backref("venue", lazy=True, viewonly=True),
+    )
+    shows = db.relationship(
+        "Show", backref="venue", lazy=True, cascade="all, delete-orphan"
     )
-    shows = db.relationship("Show", backref="venue", lazy=True)
 
 
 class Artist(db.Model):
+    __table_args__ = (db.Index("ix_artist_name", "name"),)
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=False)
     city = db.Column(db.String(120), nullable=False)
     state = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(120))
-    genres = db.Column(db.String(500), nullable=False)
+    genres = db.relationship(
+        "Genre", secondary=artist_genre, order_by="Genre.name", lazy=True
+    )
     image_link = db.Column(
         db.String(500),
         nullable=False,
@@ -50,6 +115,9 @@ class Artist(db.Model):
     seeking_venue = db.Column(db.Boolean, nullable=False, default=False)
     seeking_description = db.Column(db.String(120), nullable=False, default="")
     vanues = db.relationship(
-        "Venue", secondary="show", backref=db.backref("venue", lazy=True)
+        "Venue",
+        secondary="show",
+        viewonly=True,
+        backref=db.backref("venue", lazy=True, viewonly=True),
     )
     shows = db.relationship("Show", backref="artist", lazy=True)
@@ -0,0 +1,169 @@
+import re
+import threading
+from math import ceil
+
+from flask import abort
+from sqlalchemy import func, or_
+
+from models import db, Venue, Artist, Genre
+
+RESULTS_PER_PAGE = 10
+
+
+def trigrams(text):
+    """Returns the trigrams of every word of `text`, padded like pg_trgm does."""
+    grams = set()
+    for word in re.findall(r"\w+", text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def inner_trigrams(text):
+    """Returns the unpadded trigrams of every word of `text`.
+
+    Any text containing `text` as a substring contains all of them, so they
+    can be used to narrow down the candidates of an ILIKE '%text%' search.
+    """
+    grams = set()
+    for word in re.findall(r"\w+", text.lower()):
+        grams.update(word[i : i + 3] for i in range(len(word) - 2))
+    return grams
+
+
+def like_pattern(term):
+    """Returns the ILIKE pattern matching `term` anywhere, with the LIKE
+    wildcards of `term` escaped by a backslash."""
+    escaped = re.sub(r"([\\%_])", r"\\\1", term)
+    return f"%{escaped}%"
+
+
+def check_page(page, total, per_page=RESULTS_PER_PAGE):
+    """Aborts with 404 when `page` is outside of `total` results; the first
+    page always exists, even when there are no results.
+    """
+    if page < 1 or (page > 1 and (page - 1) * per_page >= total):
+        abort(404)
+
+
+def similarity(a, b):
+    """Same measure as pg_trgm similarity()."""
+    a_grams = trigrams(a)
+    b_grams = trigrams(b)
+    if not a_grams or not b_grams:
+        return 0.0
+    return len(a_grams & b_grams) / len(a_grams | b_grams)
+
+
+class SearchIndex:
+    """Ranked, paginated search over the `columns` and genres of `model`.
+
+    On PostgreSQL the search is an ILIKE on every column and on the genre
+    names, served by the pg_trgm GIN indexes and ranked by name similarity.
+    On other databases (the SQLite test database) an in-memory trigram
+    inverted index is used instead, giving the same matches and ranking.
+    """
+
+    def __init__(self, model, columns):
+        self.model = model
+        self.columns = columns
+        self._lock = threading.Lock()
+        self._documents = None
+        self._postings = {}
+
+    def invalidate(self):
+        """Drops the in-memory index, it is rebuilt on the next search."""
+        with self._lock:
+            self._documents = None
+            self._postings = {}
+
+    def search(self, term, page=1, per_page=RESULTS_PER_PAGE):
+        if page < 1:
+            abort(404)
+        if db.engine.dialect.name == "postgresql":
+            total, data = self._search_database(term, page, per_page)
+        else:
+            total, data = self._search_index(term, page, per_page)
+        return {
+            "count": total,
+            "data": data,
+            "page": page,
+            "pages": ceil(total / per_page),
+        }
+
+    def _search_database(self, term, page, per_page):
+        pattern = like_pattern(term)
+        query = db.session.query(self.model.id, self.model.name).filter(
+            or_(
+                *(
+                    getattr(self.model, c).ilike(pattern, escape="\\")
+                    for c in self.columns
+                ),
+                self.model.genres.any(Genre.name.ilike(pattern, escape="\\")),
+            )
+        )
+        total = query.count()
+        check_page(page, total, per_page)
+        results = (
+            query.order_by(
+                func.similarity(self.model.name, term).desc(), self.model.name
+            )
+            .limit(per_page)
+            .offset((page - 1) * per_page)
+        )
+        return total, [{"id": r.id, "name": r.name} for r in results]
+
+    def _search_index(self, term, page, per_page):
+        with self._lock:
+            if self._documents is None:
+                self._build()
+            documents = self._documents
+            postings = self._postings
+
+        term = term.lower()
+        grams = inner_trigrams(term)
+        if grams:
+            candidates = set.intersection(
+                *(postings.get(gram, set()) for gram in grams)
+            )
+        else:
+            candidates = documents.keys()
+        matches = [
+            (-similarity(term, documents[i][0]), documents[i][0], i)
+            for i in candidates
+            if any(term in field for field in documents[i][1])
+        ]
+        matches.sort()
+        check_page(page, len(matches), per_page)
+        start = (page - 1) * per_page
+        return (
+            len(matches),
+            [{"id": i, "name": name} for _, name, i in matches[start : start + per_page]],
+        )
+
+    def _build(self):
+        records = db.session.query(
+            self.model.id, *(getattr(self.model, c) for c in self.columns)
+        )
+        genres = {}
+        for record_id, genre in db.session.query(self.model.id, Genre.name).join(
+            self.model.genres
+        ):
+            genres.setdefault(record_id, []).append(genre)
+
+        documents = {}
+        postings = {}
+        for record in records:
+            fields = tuple(
+                (value or "").lower()
+                for value in (*record[1:], *genres.get(record.id, ()))
+            )
+            documents[record.id] = (record.name, fields)
+            for gram in inner_trigrams(" ".join(fields)):
+                postings.setdefault(gram, set()).add(record.id)
+        self._documents = documents
+        self._postings = postings
+
+
+venue_search = SearchIndex(Venue, ("name", "city", "state"))
+artist_search = SearchIndex(Artist, ("name", "city", "state"))
@@ -0,0 +1,580 @@
+import os
+import re
+import tempfile
+import unittest
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from fsnd_common.testing import DatabaseTestCase, configure_test_db
+
+from app import app, get_upcoming_shows_count, SHOWS_PER_PAGE
+from directory import area_directory
+from importer import Importer
+from filters import format_datetime, format_datetimes
+from search import venue_search, artist_search, like_pattern
+from models import db, Venue, Artist, Show, Genre
+
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = True
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain)
+def compile_explain(element, compiler, **kw):
+    explain = "EXPLAIN QUERY PLAN" if compiler.dialect.name == "sqlite" else "EXPLAIN"
+    return f"{explain} {compiler.process(element.statement, **kw)}"
+
+
+configure_test_db(app, os.environ.get("FYYUR_TEST_DATABASE_URL", "sqlite://"))
+
+
+class FyyurTestCase(DatabaseTestCase):
+    """This class represents the fyyur test case"""
+
+    app = app
+    db = db
+
+    def setUp(self):
+        """Define test variables and open the transaction of the test."""
+        super().setUp()
+        self.client = app.test_client
+        area_directory.invalidate()
+        venue_search.invalidate()
+        artist_search.invalidate()
+
+    @contextmanager
+    def count_statements(self):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+    def add_venue(self, name, city="San Francisco", state="CA", genres=("Jazz",)):
+        venue = Venue(
+            name=name,
+            city=city,
+            state=state,
+            address="1015 Folsom Street",
+            genres=Genre.from_names(genres),
+        )
+        db.session.add(venue)
+        db.session.commit()
+        return venue
+
+    def add_artist(self, name, city="San Francisco", state="CA", genres=("Jazz",)):
+        artist = Artist(
+            name=name, city=city, state=state, genres=Genre.from_names(genres)
+        )
+        db.session.add(artist)
+        db.session.commit()
+        return artist
+
+    def add_show(self, artist, venue, start_time):
+        show = Show(artist_id=artist.id, venue_id=venue.id, start_time=start_time)
+        db.session.add(show)
+        db.session.commit()
+        return show
+
+    def add_areas(self, areas_n):
+        for i in range(areas_n):
+            self.add_venue(f"Venue {i}", city=f"City {i}")
+            self.add_venue(f"Other Venue {i}", city=f"City {i}")
+
+    def test_get_venues(self):
+        artist = self.add_artist("Guns N Petals")
+        hop = self.add_venue("The Musical Hop")
+        self.add_venue("Park Square Live Music & Coffee")
+        self.add_venue("The Dueling Pianos Bar", city="New York", state="NY")
+        self.add_show(artist, hop, datetime.now() + timedelta(days=1))
+        self.add_show(artist, hop, datetime.now() - timedelta(days=1))
+
+        res = self.client().get("/venues")
+        self.assertEqual(200, res.status_code)
+        self.assertIn(b"New York, NY", res.data)
+        self.assertIn(b"San Francisco, CA", res.data)
+
+        areas = area_directory.areas()
+        self.assertEqual(
+            [("New York", "NY"), ("San Francisco", "CA")],
+            [(area["city"], area["state"]) for area in areas],
+        )
+        self.assertEqual(
+            [hop.id, hop.id + 1], [venue["id"] for venue in areas[1]["venues"]]
+        )
+        self.assertEqual({hop.id: 1}, get_upcoming_shows_count())
+
+    def test_get_venues_constant_statements(self):
+        self.add_areas(2)
+        with self.count_statements() as statements:
+            self.assertEqual(200, self.client().get("/venues").status_code)
+        self.assertEqual(2, len(statements))
+
+        self.add_areas(50)
+        area_directory.reconcile()
+        with self.count_statements() as statements:
+            self.assertEqual(200, self.client().get("/venues").status_code)
+        self.assertEqual(1, len(statements))
+
+    def test_create_venue_updates_area_directory(self):
+        self.add_venue("The Musical Hop")
+        area_directory.areas()
+
+        res = self.client().post(
+            "/venues/create",
+            data={
+                "name": "The Dueling Pianos Bar",
+                "city": "New York",
+                "state": "NY",
+                "address": "335 Delancey Street",
+                "genres": ["Classical", "R&B"],
+            },
+        )
+        self.assertEqual(200, res.status_code)
+        areas = area_directory.areas()
+        self.assertEqual(("New York", "NY"), (areas[0]["city"], areas[0]["state"]))
+        self.assertEqual("The Dueling Pianos Bar", areas[0]["venues"][0]["name"])
+
+    def test_edit_and_delete_venue_update_area_directory(self):
+        hop = self.add_venue("The Musical Hop")
+        venue_id = hop.id
+        area_directory.areas()
+
+        res = self.client().post(
+            f"/venues/{venue_id}/edit",
+            data={
+                "name": "The Musical Hop",
+                "city": "Oakland",
+                "state": "CA",
+                "address": "1015 Folsom Street",
+                "genres": ["Jazz"],
+                "website_link": "https://www.themusicalhop.com",
+                "seeking_talent": "y",
+                "seeking_description": "Looking for a jazz trio.",
+            },
+        )
+        self.assertEqual(302, res.status_code)
+        hop = Venue.query.get(venue_id)
+        self.assertEqual("https://www.themusicalhop.com", hop.website_link)
+        self.assertTrue(hop.seeking_talent)
+        self.assertEqual("Looking for a jazz trio.", hop.seeking_description)
+        self.assertEqual(
+            [("Oakland", "CA")],
+            [(area["city"], area["state"]) for area in area_directory.areas()],
+        )
+
+        res = self.client().delete(f"/venues/{venue_id}")
+        self.assertEqual(200, res.status_code)
+        self.assertEqual([], area_directory.areas())
+
+    def test_delete_venue_with_shows(self):
+        artist = self.add_artist("Guns N Petals")
+        artist_id = artist.id
+        hop = self.add_venue("The Musical Hop")
+        venue_id = hop.id
+        self.add_show(artist, hop, datetime.now() + timedelta(days=1))
+        self.add_show(artist, hop, datetime.now() - timedelta(days=1))
+
+        res = self.client().delete(f"/venues/{venue_id}")
+        self.assertEqual(200, res.status_code)
+        self.assertIsNone(Venue.query.get(venue_id))
+        self.assertEqual(0, Show.query.filter_by(venue_id=venue_id).count())
+        self.assertIsNotNone(Artist.query.get(artist_id))
+
+    def test_delete_venue_not_found(self):
+        res = self.client().delete("/venues/999")
+        self.assertEqual(404, res.status_code)
+
+    def test_reconcile_area_directory(self):
+        hop = self.add_venue("The Musical Hop")
+        park = self.add_venue("Park Square Live Music & Coffee")
+        area_directory.areas()
+
+        pianos = self.add_venue("The Dueling Pianos Bar", city="New York", state="NY")
+        park.name = "Park Square"
+        db.session.delete(hop)
+        db.session.commit()
+
+        drift = area_directory.reconcile()
+        self.assertEqual(
+            {"missing": [pianos.id], "stale": [hop.id], "changed": [park.id]}, drift
+        )
+        self.assertEqual(
+            {"missing": [], "stale": [], "changed": []}, area_directory.reconcile()
+        )
+
+    def test_reconciler_not_started_by_tests(self):
+        self.client().get("/venues")
+        self.assertIsNone(area_directory._reconciler)
+
+    def test_search_venues(self):
+        self.add_venue("The Musical Hop")
+        self.add_venue(
+            "Park Square Live Music & Coffee", genres=("Rock n Roll", "Jazz")
+        )
+        self.add_venue("The Dueling Pianos Bar", city="New York", state="NY")
+
+        res = self.client().post("/venues/search", data={"search_term": "Music"})
+        self.assertEqual(200, res.status_code)
+        self.assertIn(b"The Musical Hop", res.data)
+
+        results = venue_search.search("music")
+        self.assertEqual(2, results["count"])
+        self.assertEqual(
+            ["The Musical Hop", "Park Square Live Music & Coffee"],
+            [venue["name"] for venue in results["data"]],
+        )
+        self.assertEqual(1, venue_search.search("new york")["count"])
+        self.assertEqual(1, venue_search.search("ROLL")["count"])
+        self.assertEqual(3, venue_search.search("")["count"])
+        self.assertEqual(0, venue_search.search("hop bar")["count"])
+
+    def test_search_venues_pages(self):
+        for i in range(25):
+            self.add_venue(f"Venue {i:02}")
+
+        results = venue_search.search("venue", page=3)
+        self.assertEqual(25, results["count"])
+        self.assertEqual(3, results["pages"])
+        self.assertEqual(
+            ["Venue 20", "Venue 21", "Venue 22", "Venue 23", "Venue 24"],
+            [venue["name"] for venue in results["data"]],
+        )
+
+        res = self.client().post("/venues/search?page=2", data={"search_term": "venue"})
+        self.assertEqual(200, res.status_code)
+        self.assertIn(b"Venue 10", res.data)
+        self.assertNotIn(b"Venue 09", res.data)
+
+        for page in (0, -1, 4):
+            res = self.client().post(
+                f"/venues/search?page={page}", data={"search_term": "venue"}
+            )
+            self.assertEqual(404, res.status_code)
+        res = self.client().post("/venues/search", data={"search_term": "nothing"})
+        self.assertEqual(200, res.status_code)
+
+    def test_search_escapes_like_wildcards(self):
+        self.assertEqual("%50\\%\\_off%", like_pattern("50%_off"))
+        self.add_venue("The Musical Hop")
+        self.add_venue("100% Jazz")
+        results = venue_search.search("100%")
+        self.assertEqual(["100% Jazz"], [venue["name"] for venue in results["data"]])
+        self.assertEqual(0, venue_search.search("_")["count"])
+
+    def test_search_artists(self):
+        self.add_artist("Guns N Petals", genres=("Rock n Roll",))
+        self.add_artist("Matt Quevedo", city="New York", state="NY")
+        self.assertEqual(0, artist_search.search("The Wild Sax Band")["count"])
+
+        res = self.client().post(
+            "/artists/create",
+            data={
+                "name": "The Wild Sax Band",
+                "city": "San Francisco",
+                "state": "CA",
+                "genres": ["Jazz", "Classical"],
+            },
+        )
+        self.assertEqual(200, res.status_code)
+
+        res = self.client().post("/artists/search", data={"search_term": "band"})
+        self.assertEqual(200, res.status_code)
+        self.assertIn(b"The Wild Sax Band", res.data)
+        self.assertEqual(2, artist_search.search("jazz")["count"])
+        self.assertEqual(1, artist_search.search("rock")["count"])
+
+    def add_shows_for_detail_pages(self):
+        artist = self.add_artist("Guns N Petals")
+        other_artist = self.add_artist("Matt Quevedo")
+        hop = self.add_venue("The Musical Hop", genres=("Jazz", "Reggae"))
+        pianos = self.add_venue("The Dueling Pianos Bar")
+        self.add_show(artist, hop, datetime.now() - timedelta(days=2))
+        self.add_show(other_artist, hop, datetime.now() + timedelta(days=1))
+        self.add_show(artist, hop, datetime.now() + timedelta(days=3))
+        self.add_show(artist, pianos, datetime.now() + timedelta(days=2))
+        return artist, hop
+
+    def test_show_venue(self):
+        artist, hop = self.add_shows_for_detail_pages()
+        venue_id = hop.id
+        db.session.remove()
+
+        with self.count_statements() as statements:
+            res = self.client().get(f"/venues/{venue_id}")
+        self.assertEqual(200, res.status_code)
+        self.assertEqual(1, len(statements))
+        self.assertIn(b"2 Upcoming Shows", res.data)
+        self.assertIn(b"1 Past Show", res.data)
+        self.assertIn(b"Matt Quevedo", res.data)
+        self.assertIn(b"Reggae", res.data)
+        start_times = re.findall(
+            r"<h6>\w+ \w+, \d+, \d{4} at \d+:\d\d[AP]M</h6>", res.data.decode()
+        )
+        self.assertEqual(3, len(start_times))
+
+    def test_show_artist(self):
+        artist, hop = self.add_shows_for_detail_pages()
+        artist_id = artist.id
+        db.session.remove()
+
+        with self.count_statements() as statements:
+            res = self.client().get(f"/artists/{artist_id}")
+        self.assertEqual(200, res.status_code)
+        self.assertEqual(1, len(statements))
+        self.assertIn(b"2 Upcoming Shows", res.data)
+        self.assertIn(b"1 Past Show", res.data)
+        self.assertIn(b"The Dueling Pianos Bar", res.data)
+
+    def test_show_venue_not_found(self):
+        res = self.client().get("/venues/999")
+        self.assertEqual(404, res.status_code)
+
+    def test_get_venues_by_genre(self):
+        self.add_venue("The Musical Hop", genres=("Jazz", "Reggae"))
+        self.add_venue("Park Square Live Music & Coffee", genres=("Rock n Roll",))
+        self.add_venue(
+            "The Dueling Pianos Bar", city="New York", state="NY", genres=("Jazz",)
+        )
+
+        res = self.client().get("/venues?genre=Reggae")
+        self.assertEqual(200, res.status_code)
+        self.assertIn(b"The Musical Hop", res.data)
+        self.assertNotIn(b"The Dueling Pianos Bar", res.data)
+        self.assertNotIn(b"Park Square", res.data)
+
+        res = self.client().get("/venues?genre=Jazz")
+        self.assertIn(b"The Musical Hop", res.data)
+        self.assertIn(b"The Dueling Pianos Bar", res.data)
+        self.assertNotIn(b"Park Square", res.data)
+
+    def test_get_artists_by_genre(self):
+        self.add_artist("Guns N Petals", genres=("Rock n Roll",))
+        self.add_artist("Matt Quevedo", genres=("Jazz",))
+
+        res = self.client().get("/artists?genre=Jazz")
+        self.assertEqual(200, res.status_code)
+        self.assertIn(b"Matt Quevedo", res.data)
+        self.assertNotIn(b"Guns N Petals", res.data)
+
+    def test_create_venue_reuses_genres(self):
+        self.add_venue("The Musical Hop", genres=("Jazz", "Reggae"))
+
+        res = self.client().post(
+            "/venues/create",
+            data={
+                "name": "The Dueling Pianos Bar",
+                "city": "New York",
+                "state": "NY",
+                "address": "335 Delancey Street",
+                "genres": ["Classical", "Jazz"],
+            },
+        )
+        self.assertEqual(200, res.status_code)
+        self.assertEqual(
+            ["Classical", "Jazz", "Reggae"],
+            [genre.name for genre in Genre.query.order_by(Genre.name)],
+        )
+        venue = Venue.query.filter_by(name="The Dueling Pianos Bar").one()
+        self.assertEqual(["Classical", "Jazz"], [genre.name for genre in venue.genres])
+
+    def test_get_shows_pages(self):
+        artists = [self.add_artist("Guns N Petals"), self.add_artist("Matt Quevedo")]
+        hop = self.add_venue("The Musical Hop")
+        start_time = datetime(2035, 4, 1, 20)
+        for i in range(SHOWS_PER_PAGE + 5):
+            # two shows at the same time on every page boundary
+            self.add_show(artists[i % 2], hop, start_time + timedelta(days=i // 2))
+
+        res = self.client().get("/shows")
+        self.assertEqual(200, res.status_code)
+        self.assertEqual(SHOWS_PER_PAGE, res.data.count(b"tile-show"))
+        next_cursor = f"{(start_time + timedelta(days=14)).isoformat()}_30"
+        self.assertIn(f"after={next_cursor}".encode(), res.data.replace(b"%3A", b":"))
+
+        res = self.client().get(f"/shows?after={next_cursor}")
+        self.assertEqual(200, res.status_code)
+        self.assertEqual(5, res.data.count(b"tile-show"))
+        self.assertNotIn(b"after=", res.data)
+
+    def test_get_shows_filters(self):
+        artist = self.add_artist("Guns N Petals")
+        hop = self.add_venue("The Musical Hop")
+        self.add_show(artist, hop, datetime.now() - timedelta(days=1))
+        self.add_show(artist, hop, datetime(2035, 4, 1, 20))
+        self.add_show(artist, hop, datetime(2035, 5, 1, 20))
+
+        res = self.client().get("/shows?upcoming=1")
+        self.assertEqual(2, res.data.count(b"tile-show"))
+        res = self.client().get("/shows?since=2035-04-15&until=2035-06-01")
+        self.assertEqual(1, res.data.count(b"tile-show"))
+        self.assertIn(b"May", res.data)
+
+    def test_get_shows_bad_request(self):
+        self.assertEqual(400, self.client().get("/shows?after=nope").status_code)
+        self.assertEqual(400, self.client().get("/shows?since=nope").status_code)
+
+    def test_format_datetime(self):
+        start_time = datetime(2035, 4, 1, 20, 5)
+        self.assertEqual(
+            "Sunday April, 1, 2035 at 8:05PM", format_datetime(start_time, "full")
+        )
+        self.assertEqual(
+            format_datetime(start_time), format_datetime("2035-04-01 20:05:00")
+        )
+        self.assertEqual(
+            [format_datetime(start_time, "full"), format_datetime(start_time, "full")],
+            format_datetimes([start_time, "2035-04-01 20:05:00"], "full"),
+        )
+
+    def explain(self, query):
+        """Returns the plan of `query`, with sequential scans disabled on
+        PostgreSQL so the planner picks an index whenever one applies even
+        on a small dataset."""
+        if db.engine.dialect.name == "postgresql":
+            db.session.execute("SET LOCAL enable_seqscan = off")
+        result = db.session.execute(Explain(query.statement))
+        # raw rows, the result would otherwise be typed like the explained query
+        return "\n".join(str(row[-1]) for row in result.cursor.fetchall())
+
+    def test_queries_use_indexes(self):
+        artists = [self.add_artist(f"Artist {i}") for i in range(10)]
+        venues = [self.add_venue(f"Venue {i}", city=f"City {i % 3}") for i in range(10)]
+        for i in range(100):
+            self.add_show(
+                artists[i % 10], venues[i // 10], datetime(2035, 4, 1) + timedelta(i)
+            )
+        now = datetime.now()
+
+        plans = {
+            "ix_show_venue_id_start_time": Show.query.filter(
+                Show.venue_id == venues[0].id, Show.start_time >= now
+            ),
+            "ix_show_artist_id_start_time": Show.query.filter(
+                Show.artist_id == artists[0].id, Show.start_time >= now
+            ),
+            "ix_show_start_time_id": Show.query.filter(Show.start_time >= now).order_by(
+                Show.start_time, Show.id
+            ),
+            "ix_venue_city_state": db.session.query(
+                Venue.id, Venue.city, Venue.state
+            ).order_by(Venue.city, Venue.state),
+            "ix_artist_name": Artist.query.order_by(Artist.name),
+            "ix_venue_genre_genre_id_venue_id": db.session.query(Venue.id)
+            .join(Venue.genres)
+            .filter(Genre.name == "Jazz"),
+        }
+        for index, query in plans.items():
+            with self.subTest(index=index):
+                self.assertIn(index, self.explain(query))
+
+    def test_duplicate_show(self):
+        artist = self.add_artist("Guns N Petals")
+        hop = self.add_venue("The Musical Hop")
+        self.add_show(artist, hop, datetime(2035, 4, 1, 20))
+        with self.assertRaises(IntegrityError):
+            self.add_show(artist, hop, datetime(2035, 4, 1, 20))
+
+    def write_file(self, name, content):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def test_import_command(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        venues = self.write_file(
+            "venues.csv",
+            "id,name,city,state,address,genres,seeking_talent,website_link\n"
+            "v1,The Musical Hop,San Francisco,CA,1015 Folsom Street,"
+            '"Jazz,Reggae",y,https://www.themusicalhop.com\n'
+            "v2,Nowhere,Nowhere,XX,Nowhere,Jazz,,\n"
+            "v3,The Dueling Pianos Bar,New York,NY,335 Delancey Street,"
+            "Classical,,\n",
+        )
+        artists = self.write_file(
+            "artists.ndjson",
+            '{"id": 4, "name": "Guns N Petals", "city": "San Francisco", '
+            '"state": "CA", "genres": ["Rock n Roll"], "seeking_venue": true}\n'
+            '{"id": 5, "name": "Matt Quevedo", "city": "New York", "state": "NY", '
+            '"genres": ["Jazz"], "website_link": "not a url"}\n'
+            '{"id": 6, "name": "The Wild Sax Band",\n',
+        )
+        shows = self.write_file(
+            "shows.csv",
+            "venue_id,artist_id,start_time\n"
+            "v1,4,2035-04-01 20:00:00\n"
+            "v3,4,2035-04-08 20:00:00\n"
+            "v3,4,2035-04-08 20:00:00\n"
+            "v2,4,2035-04-15 20:00:00\n"
+            "v1,4,tomorrow\n",
+        )
+
+        result = app.test_cli_runner().invoke(
+            args=[
+                "fyyur",
+                "import",
+                "--venues",
+                venues,
+                "--artists",
+                artists,
+                "--shows",
+                shows,
+                "--chunk-size",
+                "2",
+            ]
+        )
+        self.assertEqual(0, result.exit_code, result.output)
+        self.assertIn("venues: 2 imported, 1 rejected", result.output)
+        self.assertIn("artists: 1 imported, 2 rejected", result.output)
+        self.assertIn("shows: 2 imported, 3 rejected", result.output)
+        self.assertIn("line 3 rejected: {'state'", result.output)
+        self.assertIn("line 3 rejected: invalid JSON", result.output)
+
+        hop = Venue.query.filter_by(name="The Musical Hop").one()
+        self.assertTrue(hop.seeking_talent)
+        self.assertEqual(["Jazz", "Reggae"], [genre.name for genre in hop.genres])
+        self.assertEqual(["Guns N Petals"], [show.artist.name for show in hop.shows])
+        self.assertEqual(
+            ["Classical", "Jazz", "Reggae", "Rock n Roll"],
+            [genre.name for genre in Genre.query.order_by(Genre.name)],
+        )
+
+    def test_import_inserts_a_chunk_at_once(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        venues = self.write_file(
+            "venues.csv",
+            "id,name,city,state,address,genres,seeking_talent,website_link\n"
+            + "".join(
+                f"v{i},Venue {i},San Francisco,CA,{i} Folsom Street,Jazz,"
+                + ("y,https://www.themusicalhop.com\n" if i % 2 else ",\n")
+                for i in range(50)
+            ),
+        )
+        with self.count_statements() as statements:
+            report = Importer().import_venues(venues)
+        self.assertEqual(50, report.imported)
+        inserts = [s for s in statements if s.startswith("INSERT INTO venue ")]
+        self.assertEqual(1, len(inserts))
+        self.assertEqual(50, Venue.query.join(Venue.genres).count())
+        self.assertEqual(25, Venue.query.filter_by(seeking_talent=True).count())
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,14 @@
+"""Load tests and latency benchmarks of the trivia API.
+
+From the backend directory, with the repository root on PYTHONPATH:
+
+    python -m benchmarks generate sqlite:////tmp/trivia_bench.db --rows 100000
+    python -m benchmarks run sqlite:////tmp/trivia_bench.db -o before.json
+    python -m benchmarks run sqlite:////tmp/trivia_bench.db --server --workers 4
+    python -m benchmarks compare before.json after.json
+
+`run` drives the app of create_app() through the WSGI test client, which
+also counts the SQL statements of every request, or with --server through
+a pre-forked multi-process HTTP server, and reports the p50/p95/p99
+latency and the throughput of every endpoint.
+"""
@@ -0,0 +1,108 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+
+from . import __doc__ as usage
+from .data import generate
+from .runner import run_client, run_server
+
+METRICS = ("p50_ms", "p95_ms", "p99_ms", "throughput", "sql_per_request")
+
+
+def revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results):
+    print(
+        f"{'endpoint':<20} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+        f"{'p99 ms':>8} {'sql/req':>8} {'errors':>6}"
+    )
+    for name, r in results.items():
+        sql = f"{r['sql_per_request']:.1f}" if "sql_per_request" in r else "-"
+        print(
+            f"{name:<20} {r['throughput']:>8.0f} {r.get('p50_ms', 0):>8.2f} "
+            f"{r.get('p95_ms', 0):>8.2f} {r.get('p99_ms', 0):>8.2f} "
+            f"{sql:>8} {r['errors']:>6}"
+        )
+
+
+def compare(before, after):
+    print(f"{'endpoint':<20} {'metric':<16} {'before':>10} {'after':>10} {'change':>8}")
+    for name, b in before["results"].items():
+        a = after["results"].get(name)
+        if a is None:
+            continue
+        for metric in METRICS:
+            if metric in a and metric in b:
+                change = (a[metric] - b[metric]) / b[metric] * 100 if b[metric] else 0
+                print(
+                    f"{name:<20} {metric:<16} {b[metric]:>10.2f} "
+                    f"{a[metric]:>10.2f} {change:>+7.1f}%"
+                )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description=usage,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = commands.add_parser("generate", help="add synthetic questions")
+    generate_parser.add_argument("uri")
+    generate_parser.add_argument("--rows", type=int, default=10000)
+    generate_parser.add_argument("--seed", type=int, default=0)
+
+    run_parser = commands.add_parser("run", help="benchmark the endpoints")
+    run_parser.add_argument("uri")
+    run_parser.add_argument("--requests", type=int, default=1000)
+    run_parser.add_argument("--concurrency", type=int, default=8)
+    run_parser.add_argument("--server", action="store_true")
+    run_parser.add_argument("--workers", type=int, default=4)
+    run_parser.add_argument("-o", "--output", help="JSON file of the results")
+
+    compare_parser = commands.add_parser("compare", help="compare two JSON results")
+    compare_parser.add_argument("before", type=argparse.FileType())
+    compare_parser.add_argument("after", type=argparse.FileType())
+
+    args = parser.parse_args(argv)
+    if args.command == "generate":
+        seconds = generate(args.uri, args.rows, args.seed)
+        print(f"{args.rows} questions generated in {seconds:.1f}s")
+    elif args.command == "compare":
+        compare(json.load(args.before), json.load(args.after))
+    else:
+        if args.server:
+            results = run_server(
+                args.uri, args.requests, args.concurrency, args.workers
+            )
+        else:
+            results = run_client(args.uri, args.requests, args.concurrency)
+        print_results(results)
+        if args.output:
+            report = {
+                "revision": revision(),
+                "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "database": args.uri.split("@")[-1],
+                "mode": f"server, {args.workers} workers" if args.server else "client",
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "results": results,
+            }
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
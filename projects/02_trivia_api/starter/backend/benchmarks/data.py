@@ -0,0 +1,60 @@
+import random
+import time
+
+from sqlalchemy import create_engine, func, select
+
+from models import db, Question, Category, question_hash
+
+CATEGORIES = ("Science", "Art", "Geography", "History", "Entertainment", "Sports")
+WORDS = (
+    "river mountain painter novel planet element empire battle composer film "
+    "island desert ocean theory engine coin festival temple language mineral "
+    "athlete trophy emperor bridge canal poet sculpture comet galaxy volcano "
+    "harbor castle kingdom legend symphony opera ballet marathon stadium atlas"
+).split()
+CHUNK_SIZE = 10000
+
+
+def make_question(rng, index):
+    words = rng.sample(WORDS, 6)
+    # the index keeps the generated questions unique
+    question = f"Which {' '.join(words)} is number {index}?"
+    return {
+        "question": question,
+        "answer": rng.choice(WORDS).title(),
+        "difficulty": rng.randint(1, 5),
+        "question_hash": question_hash(question),
+    }
+
+
+def generate(uri, rows, seed=0):
+    """Adds `rows` synthetic questions, spread over the six categories, to
+    the database at `uri`, creating its tables when needed.
+    """
+    engine = create_engine(uri)
+    db.metadata.create_all(engine)
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    with engine.begin() as connection:
+        category_ids = [
+            id for id, in connection.execute(select([Category.id]))
+        ]
+        if not category_ids:
+            connection.execute(
+                Category.__table__.insert(), [{"type": t} for t in CATEGORIES]
+            )
+            category_ids = [
+                id for id, in connection.execute(select([Category.id]))
+            ]
+        first = connection.execute(select([func.count(Question.id)])).scalar()
+
+    for start in range(0, rows, CHUNK_SIZE):
+        chunk = []
+        for index in range(first + start, first + min(start + CHUNK_SIZE, rows)):
+            question = make_question(rng, index)
+            question["category"] = rng.choice(category_ids)
+            chunk.append(question)
+        with engine.begin() as connection:
+            connection.execute(Question.__table__.insert(), chunk)
+    engine.dispose()
+    return time.perf_counter() - started
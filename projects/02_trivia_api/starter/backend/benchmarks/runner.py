@@ -0,0 +1,210 @@
+import http.client
+import json
+import logging
+import multiprocessing
+import random
+import socket
+import statistics
+import threading
+import time
+
+from sqlalchemy import event
+from werkzeug.serving import make_server
+
+from fsnd_common.db import engine_options
+from fsnd_common.loadtest import percentile
+from flaskr import create_app
+from models import db, Question, Category
+from .data import WORDS
+
+
+def scenarios(total_questions, category_ids):
+    """Returns the request makers of every benchmarked endpoint; each one
+    returns the method, the path and the JSON body of a random request.
+    """
+    pages = max(1, total_questions // 10)
+
+    def questions(rng):
+        return "GET", f"/questions?page={rng.randint(1, min(pages, 100))}", None
+
+    def category_questions(rng):
+        return "GET", f"/categories/{rng.choice(category_ids)}/questions", None
+
+    def search(rng):
+        term = " ".join(rng.sample(WORDS, rng.randint(1, 2)))
+        return "POST", "/questions/search", {"searchTerm": term}
+
+    def quizzes(rng):
+        previous = [rng.randint(1, total_questions) for _ in range(rng.randint(0, 20))]
+        category = rng.choice([0, *category_ids])
+        body = {"previous_questions": previous, "quiz_category": {"id": category}}
+        return "POST", "/quizzes", body
+
+    return {
+        "questions": questions,
+        "category_questions": category_questions,
+        "search": search,
+        "quizzes": quizzes,
+    }
+
+
+def summarize(latencies, errors, seconds, statements=None):
+    result = {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": len(latencies) / seconds if seconds else 0.0,
+    }
+    if latencies:
+        result.update(
+            p50_ms=percentile(latencies, 50) * 1000,
+            p95_ms=percentile(latencies, 95) * 1000,
+            p99_ms=percentile(latencies, 99) * 1000,
+            mean_ms=statistics.mean(latencies) * 1000,
+        )
+    if statements is not None and latencies:
+        result["sql_per_request"] = statements / (len(latencies) + errors)
+    return result
+
+
+def drive(send, make_request, requests, concurrency, seed):
+    """Sends `requests` requests from `concurrency` threads, each with its
+    own `send` function made by `send()`.
+    """
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def client(index):
+        nonlocal errors
+        rng = random.Random(seed + index)
+        do_request = send()
+        for _ in range(requests // concurrency):
+            method, path, body = make_request(rng)
+            started = time.perf_counter()
+            status = do_request(method, path, body)
+            elapsed = time.perf_counter() - started
+            with lock:
+                if status < 500:
+                    latencies.append(elapsed)
+                else:
+                    errors += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - started
+
+
+def bench_config(uri):
+    return {
+        "SQLALCHEMY_DATABASE_URI": uri,
+        "SQLALCHEMY_TRACK_MODIFICATIONS": False,
+        "SQLALCHEMY_ENGINE_OPTIONS": engine_options(uri),
+    }
+
+
+def inspect_data(app):
+    with app.app_context():
+        total = Question.query.count()
+        category_ids = [id for id, in db.session.query(Category.id)]
+    return total, category_ids
+
+
+def run_client(uri, requests, concurrency, seed=0):
+    """Benchmarks every endpoint through the WSGI test client."""
+    app = create_app(bench_config(uri))
+    total, category_ids = inspect_data(app)
+    with app.app_context():
+        engine = db.get_engine(app)
+    statements = 0
+
+    def count(*args):
+        nonlocal statements
+        statements += 1
+
+    def send():
+        client = app.test_client()
+
+        def do_request(method, path, body):
+            return client.open(path, method=method, json=body).status_code
+
+        return do_request
+
+    results = {}
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        for name, make_request in scenarios(total, category_ids).items():
+            drive(send, make_request, min(requests, 50), 1, seed)  # warm up
+            statements = 0
+            latencies, errors, seconds = drive(
+                send, make_request, requests, concurrency, seed
+            )
+            results[name] = summarize(latencies, errors, seconds, statements)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    return results
+
+
+def serve(uri, sock):
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    app = create_app(bench_config(uri))
+    server = make_server(
+        "127.0.0.1", sock.getsockname()[1], app, threaded=True, fd=sock.fileno()
+    )
+    server.serve_forever()
+
+
+def run_server(uri, requests, concurrency, workers, seed=0):
+    """Benchmarks every endpoint through HTTP, against `workers` processes
+    accepting the connections of one listening socket.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(128)
+    port = sock.getsockname()[1]
+
+    context = multiprocessing.get_context("fork")
+    processes = [
+        context.Process(target=serve, args=(uri, sock), daemon=True)
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    def send():
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+
+        def do_request(method, path, body):
+            headers = {}
+            if body is not None:
+                body = json.dumps(body)
+                headers["Content-Type"] = "application/json"
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                return response.status
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                return 599
+
+        return do_request
+
+    try:
+        total, category_ids = inspect_data(create_app(bench_config(uri)))
+        results = {}
+        for name, make_request in scenarios(total, category_ids).items():
+            drive(send, make_request, min(requests, 50), 1, seed)  # warm up
+            latencies, errors, seconds = drive(
+                send, make_request, requests, concurrency, seed
+            )
+            results[name] = summarize(latencies, errors, seconds)
+        return results
+    finally:
+        for process in processes:
+            process.terminate()
+        sock.close()
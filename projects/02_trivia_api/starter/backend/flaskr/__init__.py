@@ -1,46 +1,107 @@
 import os
+import sys
+
+import click
 from flask import Flask, request, abort, jsonify
+from flask.cli import AppGroup
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
-from random import randint
-import random
+from flask_migrate import Migrate
+from sqlalchemy import func
+
+from models import setup_db, db, Question, Category
+from .categories import CategoryCache
+from .importer import CHUNK_SIZE, QuestionImporter, export_questions, is_ndjson
+from .pagination import QUESTIONS_PER_PAGE, paginate
+from .quiz import ALL_CATEGORIES, QuestionPicker
+from .search import QuestionSearch
+from .sessions import MemorySessionStore
+
 
-from models import setup_db, Question, Category
+trivia_cli = AppGroup("trivia", help="Trivia maintenance commands.")
 
-QUESTIONS_PER_PAGE = 10
 
+@trivia_cli.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--chunk-size", default=CHUNK_SIZE, show_default=True)
+def import_command(path, chunk_size):
+    """Bulk imports a question bank from a CSV or NDJSON file.
 
-def get_pages_n(data_len):
-    return (
-        data_len // QUESTIONS_PER_PAGE
-        if data_len % QUESTIONS_PER_PAGE is 0
-        else data_len // QUESTIONS_PER_PAGE + 1
-    )
+    The file has question, answer, category and difficulty columns, the
+    category being its name. Questions already in the database are skipped.
+    """
+    report = QuestionImporter(chunk_size).import_questions(path)
+    click.echo(report)
+    for line_no, error in report.rejected:
+        click.echo(f"  line {line_no} rejected: {error}", err=True)
 
 
-def get_formatted_categories(categories):
-    formatted_categories = {}
-    for category in categories:
-        formatted_categories[category.id] = category.type
-    return formatted_categories
+@trivia_cli.command("export")
+@click.argument("path", type=click.Path(dir_okay=False, allow_dash=True))
+@click.option("--chunk-size", default=CHUNK_SIZE, show_default=True)
+def export_command(path, chunk_size):
+    """Exports every question to a CSV or NDJSON file, `-` for NDJSON on
+    the standard output.
+    """
+    if path == "-":
+        count = export_questions(sys.stdout, True, chunk_size)
+    else:
+        with open(path, "w", newline="") as out:
+            count = export_questions(out, is_ndjson(path), chunk_size)
+        click.echo(f"questions: {count} exported", err=True)
 
 
-def get_page(data, page, page_size):
-    if data is None:
-        return []
-    pages_number = get_pages_n(len(data))
-    if page not in range(1, pages_number + 1):
-        abort(404)
-    start = (page - 1) * page_size
-    end = start + page_size
-    return data[start:end]
+def mutation_response(payload):
+    """Completes the response of a question write with the new total and,
+    with `?include=questions&page=`, one page of the questions. The write is
+    already committed, so a page past the end is empty rather than a 404.
+    """
+    payload["success"] = True
+    payload["total_questions"] = db.session.query(func.count(Question.id)).scalar()
+    if request.args.get("include") == "questions":
+        page = max(request.args.get("page", 1, type=int), 1)
+        questions = (
+            Question.query.order_by(Question.id)
+            .limit(QUESTIONS_PER_PAGE)
+            .offset((page - 1) * QUESTIONS_PER_PAGE)
+        )
+        payload["questions"] = [question.format() for question in questions]
+    return jsonify(payload)
+
+
+def revalidated(response, etag=None, max_age=0):
+    """Adds an ETag to a GET response and turns it into a 304 when the
+    client already has it. Without `max_age` clients revalidate every time.
+    """
+    if etag is None:
+        response.add_etag()
+    else:
+        response.set_etag(etag)
+    if max_age:
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 
 def create_app(test_config=None):
     # create and configure the app
     app = Flask(__name__)
+    if test_config is not None:
+        app.config.from_mapping(test_config)
     setup_db(app)
+    Migrate(app, db)
     CORS(app)
+    app.cli.add_command(trivia_cli)
+    question_picker = QuestionPicker()
+    question_search = QuestionSearch()
+    category_cache = CategoryCache(app.config.get("CATEGORY_CACHE_TTL", 300))
+    category_cache.listen()
+    # the in-memory caches of the app, dropped by the tests between tests
+    app.extensions["trivia_caches"] = (question_picker, question_search, category_cache)
+    # a RedisSessionStore shares the quiz sessions between several workers
+    quiz_sessions = app.config.get("QUIZ_SESSION_STORE") or MemorySessionStore()
 
     @app.after_request
     def after_request(response):
@@ -54,92 +115,105 @@ def create_app(test_config=None):
 
     @app.route("/categories")
     def get_categories():
-        categories = Category.query.order_by(Category.id).all()
-        formatted_categories = get_formatted_categories(categories)
-        return jsonify(
+        categories, etag = category_cache.get()
+        response = jsonify(
             {
                 "success": True,
-                "categories": formatted_categories,
+                "categories": categories,
                 "total_categories": len(categories),
             }
         )
+        return revalidated(response, etag, max_age=category_cache.ttl)
 
     @app.route("/questions")
     def get_questions():
-        all_questions = Question.query.order_by(Question.id).all()
-        categories = Category.query.order_by(Category.id).all()
+        categories, _ = category_cache.get()
         page = request.args.get("page", 1, type=int)
-        questions_page = get_page(all_questions, page, QUESTIONS_PER_PAGE)
+        questions_page, total_questions = paginate(
+            Question.query.order_by(Question.id), page
+        )
         res_questions = [question.format() for question in questions_page]
-        formatted_categories = get_formatted_categories(categories)
-        return jsonify(
+        response = jsonify(
             {
                 "success": True,
                 "questions": res_questions,
-                "categories": formatted_categories,
-                "total_questions": len(all_questions),
+                "categories": categories,
+                "total_questions": total_questions,
             }
         )
+        return revalidated(response)
 
-    @app.route("/questions/<q_id>", methods=["DELETE"])
+    @app.route("/questions/<int:q_id>", methods=["DELETE"])
     def delete_question(q_id):
-        question_to_delete = Question.query.get(q_id)
+        question_to_delete = Question.query.get_or_404(q_id)
         question_to_delete.delete()
-        questions = Question.query.order_by(Question.id).all()
-        res = [question.format() for question in questions]
-        return jsonify(
-            {
-                "success": True,
-                "deleted": q_id,
-                "questions": res,
-                "total_questions": len(res),
-            }
-        )
+        question_picker.invalidate()
+        question_search.invalidate()
+        return mutation_response({"deleted": q_id})
 
     @app.route("/questions", methods=["POST"])
     def post_question():
         body = request.get_json()
         question = body.get("question")
         answer = body.get("answer")
-        category = body.get("category")
-        difficulty = body.get("difficulty")
+        try:
+            category = int(body.get("category"))
+            difficulty = int(body.get("difficulty"))
+        except (TypeError, ValueError):
+            abort(422)
+        if not question or not answer or Category.query.get(category) is None:
+            abort(422)
         question = Question(
             question=question, answer=answer, category=category, difficulty=difficulty
         )
         question.insert()
-        questions = Question.query.order_by(Question.id).all()
-        res = [question.format() for question in questions]
-        return jsonify({"success": True, "total_questions": len(res)})
+        question_picker.invalidate()
+        question_search.invalidate()
+        return mutation_response(
+            {"created": question.id, "question": question.format()}
+        )
 
     @app.route("/questions/search", methods=["POST"])
     def search_questions():
-        search_term = request.get_json().get("searchTerm")
+        body = request.get_json() or {}
+        search_term = body.get("searchTerm")
         if search_term is None:
             abort(400)
+        try:
+            category = body.get("category")
+            category = None if category in (None, "", 0) else int(category)
+            difficulty = body.get("difficulty")
+            difficulty = None if difficulty in (None, "") else int(difficulty)
+        except (TypeError, ValueError):
+            abort(400)
 
-        questions = Question.query.filter(
-            Question.question.ilike(f"%{search_term}%")
-        ).all()
+        page = request.args.get("page", 1, type=int)
+        questions, total_questions = question_search.search(
+            search_term, page, category, difficulty
+        )
         return jsonify(
             {
                 "success": True,
                 "questions": [question.format() for question in questions],
-                "total_questions": len(questions),
+                "total_questions": total_questions,
             }
         )
 
-    @app.route("/categories/<cat_id>/questions")
+    @app.route("/categories/<int:cat_id>/questions")
     def get_question_for_categories(cat_id):
-        questions = (
-            Question.query.join(Category, Category.id == Question.category)
-            .filter(Question.category == cat_id)
-            .order_by(Question.id)
-            .all()
+        questions = Question.query.filter(Question.category == cat_id).order_by(
+            Question.id
         )
         page = request.args.get("page", 1, type=int)
-        questions_page = get_page(questions, page, QUESTIONS_PER_PAGE)
+        questions_page, total_questions = paginate(questions, page)
+        if not total_questions:
+            # an unknown category, or one without questions, has no pages
+            abort(404)
         res = [question.format() for question in questions_page]
-        return jsonify({"success": True, "questions": res, "total_questions": len(res)})
+        response = jsonify(
+            {"success": True, "questions": res, "total_questions": total_questions}
+        )
+        return revalidated(response)
 
     @app.route("/quizzes", methods=["POST"])
     def get_next_question():
@@ -148,30 +222,82 @@ def create_app(test_config=None):
 
         if quiz_category is None or previous_questions_ids is None:
             abort(400)
+        if not isinstance(previous_questions_ids, list) or not all(
+            isinstance(id, int) for id in previous_questions_ids
+        ):
+            abort(400)
 
-        prev_questions_ids = [q_id for q_id in previous_questions_ids]
-
-        cat_questions = None
-        if quiz_category["id"] == 0:
-            cat_questions = Question.query.all()
-        else:
-            cat_questions = Question.query.filter(
-                Question.category == quiz_category["id"]
-            ).all()
-        questions = [q for q in cat_questions if q.id not in prev_questions_ids]
+        try:
+            category = int(quiz_category["id"])
+        except (KeyError, TypeError, ValueError):
+            abort(400)
+        categories, _ = category_cache.get()
+        if category != ALL_CATEGORIES and category not in categories:
+            abort(400)
 
-        if len(questions) <= 0:
+        question, questions_left = question_picker.pick(
+            category, previous_questions_ids
+        )
+        if question is None:
             return jsonify({"success": True, "questions_left": 0})
 
-        rand_index = randint(0, len(questions) - 1)
         return jsonify(
             {
                 "success": True,
-                "question": questions[rand_index].format(),
-                "questions_left": len(questions) - 1,
+                "question": question.format(),
+                "questions_left": questions_left,
             }
         )
 
+    @app.route("/quizzes/sessions", methods=["POST"])
+    def create_quiz_session():
+        quiz_category = (request.get_json() or {}).get("quiz_category")
+        if quiz_category is None:
+            abort(400)
+        try:
+            category = int(quiz_category["id"])
+        except (KeyError, TypeError, ValueError):
+            abort(400)
+
+        question_ids = question_picker.shuffled_ids(category)
+        session_id = quiz_sessions.create(question_ids)
+        return jsonify(
+            {
+                "success": True,
+                "session_id": session_id,
+                "total_questions": len(question_ids),
+            }
+        )
+
+    @app.route("/quizzes/sessions/<session_id>/next", methods=["POST"])
+    def get_next_session_question(session_id):
+        while True:
+            try:
+                question_id, questions_left = quiz_sessions.pop(session_id)
+            except KeyError:
+                abort(404)
+            if question_id is None:
+                return jsonify({"success": True, "questions_left": 0})
+            question = Question.query.get(question_id)
+            # questions deleted since the session started are skipped, so
+            # questions_left is an upper bound: it counts the deleted ones
+            # not reached yet
+            if question is not None:
+                break
+
+        return jsonify(
+            {
+                "success": True,
+                "question": question.format(),
+                "questions_left": questions_left,
+            }
+        )
+
+    @app.route("/quizzes/sessions/<session_id>", methods=["DELETE"])
+    def delete_quiz_session(session_id):
+        quiz_sessions.delete(session_id)
+        return jsonify({"success": True, "deleted": session_id})
+
     @app.errorhandler(400)
     def not_found(error):
         return (
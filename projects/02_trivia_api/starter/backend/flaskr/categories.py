@@ -0,0 +1,68 @@
+import hashlib
+import json
+import threading
+import time
+import weakref
+
+from sqlalchemy import event
+
+from models import Category
+
+# the caches to invalidate when a Category is written; the ORM listeners are
+# registered once for the process, not by every app created
+_listening = weakref.WeakSet()
+
+
+def _invalidate_caches(*args):
+    for cache in list(_listening):
+        cache.invalidate()
+
+
+for _name in ("after_insert", "after_update", "after_delete"):
+    event.listen(Category, _name, _invalidate_caches)
+
+
+def get_formatted_categories(categories):
+    formatted_categories = {}
+    for category in categories:
+        formatted_categories[category.id] = category.type
+    return formatted_categories
+
+
+class CategoryCache:
+    """Keeps the {id: type} map of the categories in memory.
+
+    The map is reloaded after `ttl` seconds, which bounds how long a change
+    made by another process goes unnoticed, and right away once `invalidate`
+    is called; `listen` calls it whenever a Category is written through the
+    ORM of this process.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._cached = None
+
+    def listen(self):
+        _listening.add(self)
+
+    def invalidate(self, *args):
+        with self._lock:
+            self._cached = None
+
+    def get(self):
+        """Returns the categories and an ETag identifying them."""
+        with self._lock:
+            cached = self._cached
+        if cached is not None and time.monotonic() - cached[2] < self.ttl:
+            return cached[0], cached[1]
+
+        categories = get_formatted_categories(
+            Category.query.order_by(Category.id).all()
+        )
+        etag = hashlib.sha1(
+            json.dumps(sorted(categories.items())).encode()
+        ).hexdigest()
+        with self._lock:
+            self._cached = (categories, etag, time.monotonic())
+        return categories, etag
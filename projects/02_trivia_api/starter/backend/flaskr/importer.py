@@ -0,0 +1,137 @@
+import csv
+import json
+
+from fsnd_common.importing import ImportReport, is_ndjson, read_chunks, read_rows
+
+from models import db, Question, Category, question_hash
+
+CHUNK_SIZE = 1000
+FIELDS = ("question", "answer", "category", "difficulty")
+
+
+class QuestionImporter:
+    """Bulk loads a question bank from a CSV or NDJSON file.
+
+    Rows have a question, an answer, a category name and a difficulty from
+    1 to 5; unknown categories are created. Questions whose normalized text
+    is already in the database, or earlier in the file, are skipped. Every
+    chunk is inserted with one bulk insert and committed on its own.
+    """
+
+    def __init__(self, chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.category_ids = {
+            type.lower(): id
+            for id, type in db.session.query(Category.id, Category.type)
+        }
+
+    def import_questions(self, path):
+        report = ImportReport("questions", duplicates=0)
+        seen = set()
+        for chunk in read_chunks(read_rows(path, report), self.chunk_size):
+            rows = []
+            for line_no, row in chunk:
+                mapping, error = self.validate(row)
+                if error:
+                    report.reject(line_no, error)
+                    continue
+                if mapping["question_hash"] in seen:
+                    report.duplicates += 1
+                    continue
+                seen.add(mapping["question_hash"])
+                rows.append(mapping)
+            if not rows:
+                continue
+
+            existing = {
+                hash
+                for hash, in db.session.query(Question.question_hash).filter(
+                    Question.question_hash.in_(
+                        [mapping["question_hash"] for mapping in rows]
+                    )
+                )
+            }
+            mappings = []
+            for mapping in rows:
+                if mapping["question_hash"] in existing:
+                    report.duplicates += 1
+                    continue
+                mapping["category"] = self.category_id(mapping["category"])
+                mappings.append(mapping)
+            db.session.bulk_insert_mappings(Question, mappings)
+            db.session.commit()
+            report.imported += len(mappings)
+        return report.finish()
+
+    @staticmethod
+    def validate(row):
+        """Returns the mapping to insert for `row`, with the category name, or
+        the reason it is invalid.
+
+        NDJSON values may be numbers: the text fields are read as strings.
+        """
+        text = {f: "" if row.get(f) is None else str(row[f]).strip() for f in FIELDS}
+        missing = [f for f in FIELDS if not text[f]]
+        if missing:
+            return None, f"missing {', '.join(missing)}"
+        try:
+            difficulty = int(row["difficulty"])
+        except (TypeError, ValueError):
+            difficulty = 0
+        if not 1 <= difficulty <= 5:
+            return None, "difficulty must be between 1 and 5"
+        return {
+            "question": text["question"],
+            "answer": text["answer"],
+            "category": text["category"],
+            "difficulty": difficulty,
+            "question_hash": question_hash(text["question"]),
+        }, None
+
+    def category_id(self, name):
+        id = self.category_ids.get(name.lower())
+        if id is None:
+            category = Category(type=name)
+            db.session.add(category)
+            db.session.flush()
+            id = self.category_ids[name.lower()] = category.id
+        return id
+
+
+def export_questions(out, ndjson=True, chunk_size=CHUNK_SIZE):
+    """Writes every question to the file `out`, with category names.
+
+    The rows are streamed from a server-side cursor, `chunk_size` at a
+    time, so memory use does not grow with the number of questions.
+    """
+    categories = dict(db.session.query(Category.id, Category.type))
+    rows = (
+        db.session.query(
+            Question.question, Question.answer, Question.category, Question.difficulty
+        )
+        .order_by(Question.id)
+        .execution_options(stream_results=True)
+        .yield_per(chunk_size)
+    )
+    writer = None if ndjson else csv.writer(out)
+    if writer:
+        writer.writerow(FIELDS)
+    count = 0
+    for question, answer, category, difficulty in rows:
+        category = categories.get(category, category)
+        if writer:
+            writer.writerow((question, answer, category, difficulty))
+        else:
+            out.write(
+                json.dumps(
+                    {
+                        "question": question,
+                        "answer": answer,
+                        "category": category,
+                        "difficulty": difficulty,
+                    }
+                )
+                + "\n"
+            )
+        count += 1
+    return count
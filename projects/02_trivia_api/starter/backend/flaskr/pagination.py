@@ -0,0 +1,22 @@
+from flask import abort
+
+QUESTIONS_PER_PAGE = 10
+
+
+def check_page(page, total, page_size=QUESTIONS_PER_PAGE):
+    """Aborts with 404 when `page` is outside of `total` results; the first
+    page always exists, even when there are no results.
+    """
+    if page < 1 or (page > 1 and (page - 1) * page_size >= total):
+        abort(404)
+
+
+def paginate(query, page, page_size=QUESTIONS_PER_PAGE):
+    """Returns the rows of `page` and the total number of rows of `query`.
+
+    Only the rows of the page are fetched, with LIMIT/OFFSET, and the total
+    comes from a COUNT(*).
+    """
+    total = query.order_by(None).count()
+    check_page(page, total, page_size)
+    return query.limit(page_size).offset((page - 1) * page_size).all(), total
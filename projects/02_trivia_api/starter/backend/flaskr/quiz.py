@@ -0,0 +1,79 @@
+import random
+import threading
+import time
+
+from models import db, Question
+
+ALL_CATEGORIES = 0
+# Rejection sampling tries before picking among the eligible ids explicitly
+MAX_DRAWS = 8
+
+
+class QuestionPicker:
+    """Picks random quiz questions from cached per-category id arrays.
+
+    The ids of a category are loaded once, then kept for `ttl` seconds or
+    until `invalidate` is called after a question is added or deleted. A
+    question is drawn by rejection sampling against the set of previous
+    questions, so a round costs a few array lookups and one query by
+    primary key whatever the size of the category.
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._ids = {}
+
+    def invalidate(self):
+        with self._lock:
+            self._ids.clear()
+
+    def category_ids(self, category):
+        """Returns the ids of the questions of `category`, as a tuple and a set."""
+        with self._lock:
+            cached = self._ids.get(category)
+        if cached is not None and time.monotonic() - cached[2] < self.ttl:
+            return cached[0], cached[1]
+
+        query = db.session.query(Question.id)
+        if category != ALL_CATEGORIES:
+            query = query.filter(Question.category == category)
+        ids = tuple(id for id, in query)
+        cached = (ids, frozenset(ids), time.monotonic())
+        with self._lock:
+            self._ids[category] = cached
+        return cached[0], cached[1]
+
+    def shuffled_ids(self, category):
+        """Returns the ids of the questions of `category` in random order."""
+        ids, _ = self.category_ids(category)
+        return random.sample(ids, len(ids))
+
+    def pick(self, category, previous_ids):
+        """Returns a random question of `category` not in `previous_ids`.
+
+        Returns the question, None when there is none left, and the number
+        of questions left after this one.
+        """
+        ids, id_set = self.category_ids(category)
+        previous = {id for id in previous_ids if id in id_set}
+        left = len(ids) - len(previous)
+        if left <= 0:
+            return None, 0
+
+        question_id = None
+        for _ in range(MAX_DRAWS):
+            candidate = ids[random.randrange(len(ids))]
+            if candidate not in previous:
+                question_id = candidate
+                break
+        if question_id is None:
+            # most of the category was already asked
+            question_id = random.choice([id for id in ids if id not in previous])
+
+        question = Question.query.get(question_id)
+        if question is None:
+            # deleted by another process since the ids were cached
+            self.invalidate()
+            return self.pick(category, previous_ids)
+        return question, left - 1
@@ -0,0 +1,114 @@
+import re
+import threading
+
+from sqlalchemy import func, literal_column
+
+from models import db, Question
+from .pagination import QUESTIONS_PER_PAGE, check_page, paginate
+
+# Same expression as the ix_questions_search GIN index, so that PostgreSQL
+# can use it; see migrations/versions/6d1f0e2b7c4a_.py
+SEARCH_VECTOR = (
+    "to_tsvector('english', coalesce(questions.question, '') || ' ' "
+    "|| coalesce(questions.answer, ''))"
+)
+
+
+def tokens(text):
+    return re.findall(r"\w+", (text or "").lower())
+
+
+class QuestionSearch:
+    """Ranked, paginated full-text search over questions and answers.
+
+    On PostgreSQL the search is a tsvector match served by the GIN index of
+    the migrations and ranked by ts_rank. On other databases (the SQLite
+    test database) an in-memory inverted index of the words of the
+    questions and answers is used instead: every word of the search must
+    appear, and results are ranked by how often they do.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._documents = None
+        self._postings = {}
+
+    def invalidate(self):
+        """Drops the in-memory index, it is rebuilt on the next search."""
+        with self._lock:
+            self._documents = None
+            self._postings = {}
+
+    def search(self, term, page=1, category=None, difficulty=None):
+        """Returns the questions of `page` and the total number of matches.
+
+        An empty `term` matches every question of the category and
+        difficulty.
+        """
+        if db.engine.dialect.name == "postgresql":
+            return self._search_database(term, page, category, difficulty)
+        return self._search_index(term, page, category, difficulty)
+
+    def _search_database(self, term, page, category, difficulty):
+        query = Question.query
+        if category is not None:
+            query = query.filter(Question.category == category)
+        if difficulty is not None:
+            query = query.filter(Question.difficulty == difficulty)
+        if not tokens(term):
+            return paginate(query.order_by(Question.id), page)
+
+        vector = literal_column(SEARCH_VECTOR)
+        tsquery = func.plainto_tsquery("english", term)
+        query = query.filter(vector.op("@@")(tsquery)).order_by(
+            func.ts_rank(vector, tsquery).desc(), Question.id
+        )
+        return paginate(query, page)
+
+    def _search_index(self, term, page, category, difficulty):
+        with self._lock:
+            if self._documents is None:
+                self._build()
+            documents = self._documents
+            postings = self._postings
+
+        words = set(tokens(term))
+        if words:
+            candidates = set.intersection(
+                *(set(postings.get(word, ())) for word in words)
+            )
+        else:
+            candidates = documents.keys()
+        matches = sorted(
+            (-sum(postings[word][i] for word in words), i)
+            for i in candidates
+            if (category is None or documents[i][0] == category)
+            and (difficulty is None or documents[i][1] == difficulty)
+        )
+        check_page(page, len(matches))
+
+        start = (page - 1) * QUESTIONS_PER_PAGE
+        ids = [i for _, i in matches[start : start + QUESTIONS_PER_PAGE]]
+        questions = {
+            question.id: question
+            for question in Question.query.filter(Question.id.in_(ids))
+        }
+        return [questions[i] for i in ids if i in questions], len(matches)
+
+    def _build(self):
+        documents = {}
+        postings = {}
+        records = db.session.query(
+            Question.id,
+            Question.question,
+            Question.answer,
+            Question.category,
+            Question.difficulty,
+        )
+        for id, question, answer, category, difficulty in records:
+            documents[id] = (category, difficulty)
+            for word in tokens(question) + tokens(answer):
+                counts = postings.setdefault(word, {})
+                counts[id] = counts.get(id, 0) + 1
+        self._documents = documents
+        self._postings = postings
@@ -0,0 +1,129 @@
+import secrets
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+
+SESSION_TTL = 3600
+
+
+class SessionStore(ABC):
+    """Keeps the questions left to ask in each quiz session.
+
+    A session is created with the ids of its questions, already shuffled,
+    and every round pops the next one. Sessions unused for `ttl` seconds
+    are evicted.
+    """
+
+    def __init__(self, ttl=SESSION_TTL):
+        self.ttl = ttl
+
+    @staticmethod
+    def new_id():
+        return secrets.token_urlsafe(16)
+
+    @abstractmethod
+    def create(self, question_ids):
+        """Stores a new session and returns its id."""
+
+    @abstractmethod
+    def pop(self, session_id):
+        """Returns the next question id, or None once the session is over,
+        and the number of questions left after it.
+
+        Raises KeyError for an unknown or expired session.
+        """
+
+    @abstractmethod
+    def delete(self, session_id):
+        pass
+
+
+class MemorySessionStore(SessionStore):
+    """Sessions kept in the memory of the process."""
+
+    def __init__(self, ttl=SESSION_TTL):
+        super().__init__(ttl)
+        self._lock = threading.Lock()
+        # least recently used sessions first, so expired ones are at the front
+        self._sessions = OrderedDict()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _evict(self, now):
+        while self._sessions:
+            session_id, (_, expires) = next(iter(self._sessions.items()))
+            if expires > now:
+                break
+            del self._sessions[session_id]
+
+    def create(self, question_ids):
+        session_id = self.new_id()
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            self._sessions[session_id] = (deque(question_ids), now + self.ttl)
+        return session_id
+
+    def pop(self, session_id):
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            order, _ = self._sessions[session_id]
+            self._sessions[session_id] = (order, now + self.ttl)
+            self._sessions.move_to_end(session_id)
+            if not order:
+                return None, 0
+            return order.popleft(), len(order)
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+class RedisSessionStore(SessionStore):
+    """Sessions kept in Redis, shared by every worker of the app.
+
+    The order of a session is a list popped from the left; a marker key
+    tells an exhausted session, whose list Redis removed, from an expired
+    one. `client` is a redis.Redis instance or anything with the same
+    commands.
+    """
+
+    def __init__(self, client, ttl=SESSION_TTL, prefix="trivia:quiz:"):
+        super().__init__(ttl)
+        self.client = client
+        self.prefix = prefix
+
+    def _keys(self, session_id):
+        key = self.prefix + session_id
+        return key, key + ":alive"
+
+    def create(self, question_ids):
+        session_id = self.new_id()
+        order_key, alive_key = self._keys(session_id)
+        pipe = self.client.pipeline()
+        if question_ids:
+            pipe.rpush(order_key, *question_ids)
+            pipe.expire(order_key, self.ttl)
+        pipe.set(alive_key, 1, ex=self.ttl)
+        pipe.execute()
+        return session_id
+
+    def pop(self, session_id):
+        order_key, alive_key = self._keys(session_id)
+        pipe = self.client.pipeline()
+        pipe.lpop(order_key)
+        pipe.llen(order_key)
+        pipe.expire(order_key, self.ttl)
+        pipe.expire(alive_key, self.ttl)
+        question_id, left, _, alive = pipe.execute()
+        if not alive:
+            raise KeyError(session_id)
+        if question_id is None:
+            return None, 0
+        return int(question_id), left
+
+    def delete(self, session_id):
+        self.client.delete(*self._keys(session_id))
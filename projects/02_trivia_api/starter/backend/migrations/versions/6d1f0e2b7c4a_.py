@@ -0,0 +1,29 @@
+"""full-text question search
+
+Revision ID: 6d1f0e2b7c4a
+Revises: 
+Create Date: 2020-08-02 10:14:51.208713
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6d1f0e2b7c4a'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # same expression as flaskr.search.SEARCH_VECTOR
+    op.execute("""
+        CREATE INDEX ix_questions_search ON questions USING gin (
+            to_tsvector('english', coalesce(question, '') || ' ' || coalesce(answer, ''))
+        )
+    """)
+
+
+def downgrade():
+    op.drop_index('ix_questions_search', table_name='questions')
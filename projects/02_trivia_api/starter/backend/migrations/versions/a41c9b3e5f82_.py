@@ -0,0 +1,54 @@
+"""question hash for deduplication
+
+Revision ID: a41c9b3e5f82
+Revises: 6d1f0e2b7c4a
+Create Date: 2020-08-09 16:42:07.530126
+
+"""
+import hashlib
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a41c9b3e5f82'
+down_revision = '6d1f0e2b7c4a'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+def question_hash(question):
+    # frozen copy of models.question_hash, so that later changes to the model
+    # do not change what this revision computes
+    normalized = ' '.join(re.findall(r'\w+', (question or '').lower()))
+    return hashlib.sha1(normalized.encode()).hexdigest()
+
+
+def upgrade():
+    op.add_column('questions', sa.Column('question_hash', sa.String(length=40), nullable=True))
+
+    # the normalization lives in python, backfill from there
+    connection = op.get_bind()
+    questions = sa.table('questions', sa.column('id', sa.Integer), sa.column('question', sa.String), sa.column('question_hash', sa.String))
+    update = questions.update().where(questions.c.id == sa.bindparam('question_id')).values(question_hash=sa.bindparam('hash'))
+    last_id = None
+    while True:
+        batch = sa.select([questions.c.id, questions.c.question]).order_by(questions.c.id).limit(BATCH_SIZE)
+        if last_id is not None:
+            batch = batch.where(questions.c.id > last_id)
+        rows = connection.execute(batch).fetchall()
+        if not rows:
+            break
+        connection.execute(update, [{'question_id': id, 'hash': question_hash(question)} for id, question in rows])
+        last_id = rows[-1][0]
+
+    op.create_index('ix_questions_question_hash', 'questions', ['question_hash'], postgresql_using='hash')
+
+
+def downgrade():
+    op.drop_index('ix_questions_question_hash', table_name='questions')
+    op.drop_column('questions', 'question_hash')
@@ -0,0 +1,49 @@
+"""integer category foreign key
+
+Revision ID: c7e2d94a1b36
+Revises: a41c9b3e5f82
+Create Date: 2020-08-15 11:27:43.861590
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e2d94a1b36'
+down_revision = 'a41c9b3e5f82'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    columns = {column['name']: column for column in inspector.get_columns('questions')}
+    # trivia.psql already has an integer column, the tables created from the
+    # old String model a text one
+    if not isinstance(columns['category']['type'], sa.Integer):
+        # text categories that are not an id become NULL
+        op.alter_column('questions', 'category',
+                   existing_type=sa.VARCHAR(),
+                   type_=sa.Integer(),
+                   postgresql_using="CASE WHEN category::text ~ '^[0-9]+$' THEN category::text::integer END")
+    # trivia.psql names its foreign key "category": replace it by the one the
+    # model declares rather than adding a second one
+    for foreign_key in inspector.get_foreign_keys('questions'):
+        if foreign_key['constrained_columns'] == ['category']:
+            op.drop_constraint(foreign_key['name'], 'questions', type_='foreignkey')
+    op.execute('UPDATE questions SET category = NULL WHERE category NOT IN (SELECT id FROM categories)')
+    op.create_foreign_key('questions_category_fkey', 'questions', 'categories', ['category'], ['id'],
+                          onupdate='CASCADE', ondelete='SET NULL')
+    op.create_index('ix_questions_category_id', 'questions', ['category', 'id'])
+    op.create_index('ix_questions_difficulty', 'questions', ['difficulty'])
+
+
+def downgrade():
+    # back to the schema of trivia.psql: the column stays an integer, with its
+    # "category" foreign key
+    op.drop_index('ix_questions_difficulty', table_name='questions')
+    op.drop_index('ix_questions_category_id', table_name='questions')
+    op.drop_constraint('questions_category_fkey', 'questions', type_='foreignkey')
+    op.create_foreign_key('category', 'questions', 'categories', ['category'], ['id'],
+                          onupdate='CASCADE', ondelete='SET NULL')
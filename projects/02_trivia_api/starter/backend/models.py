@@ -1,10 +1,14 @@
 import os
-from sqlalchemy import Column, String, Integer, create_engine
+import hashlib
+import re
+from sqlalchemy import Column, String, Integer, ForeignKey, Index, create_engine
 from flask_sqlalchemy import SQLAlchemy
 import json
 
+from fsnd_common.db import configure_db, database_uri
+
 database_name = "trivia"
-database_path = "postgres://{}/{}".format("localhost:5432", database_name)
+database_path = database_uri("postgres://{}/{}".format("localhost:5432", database_name))
 
 db = SQLAlchemy()
 
@@ -15,11 +19,20 @@ setup_db(app)
 
 
 def setup_db(app, database_path=database_path):
-    app.config["SQLALCHEMY_DATABASE_URI"] = database_path
-    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    # apps created with a database in their config, like the tests, keep it
+    if "SQLALCHEMY_DATABASE_URI" not in app.config:
+        configure_db(app, database_path)
     db.app = app
     db.init_app(app)
-    db.create_all()
+
+
+def question_hash(question):
+    """Returns the SHA-1 of the question text, ignoring case, punctuation and
+    spacing, so that reworded copies of a question are told apart but
+    reformatted ones are not.
+    """
+    normalized = " ".join(re.findall(r"\w+", (question or "").lower()))
+    return hashlib.sha1(normalized.encode()).hexdigest()
 
 
 """
@@ -30,18 +43,29 @@ Question
 
 class Question(db.Model):
     __tablename__ = "questions"
+    __table_args__ = (
+        # only looked up by equality, when deduplicating imported questions
+        Index("ix_questions_question_hash", "question_hash", postgresql_using="hash"),
+        # questions of a category, in id order, for the listings and the quiz
+        Index("ix_questions_category_id", "category", "id"),
+        Index("ix_questions_difficulty", "difficulty"),
+    )
 
     id = Column(Integer, primary_key=True)
     question = Column(String)
     answer = Column(String)
-    category = Column(String)
+    category = Column(
+        Integer, ForeignKey("categories.id", onupdate="CASCADE", ondelete="SET NULL")
+    )
     difficulty = Column(Integer)
+    question_hash = Column(String(40))
 
     def __init__(self, question, answer, category, difficulty):
         self.question = question
         self.answer = answer
         self.category = category
         self.difficulty = difficulty
+        self.question_hash = question_hash(question)
 
     def insert(self):
         db.session.add(self)
@@ -1,38 +1,253 @@
 import os
+import re
+import tempfile
+import time
 import unittest
 import json
-from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, inspect
 
 from flaskr import create_app
-from models import setup_db, Question, Category
+from flaskr.categories import CategoryCache
+from flaskr.importer import QuestionImporter
+from flaskr.sessions import MemorySessionStore, RedisSessionStore
+from fsnd_common.testing import DatabaseTestCase, worker_db_config
+from models import db, Category, Question, question_hash
 
 
-class TriviaTestCase(unittest.TestCase):
-    """This class represents the trivia test case"""
+class FakeRedis:
+    """In-process stand-in for the Redis commands used by RedisSessionStore."""
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+
+    def _get(self, key):
+        if key in self.expires and self.expires[key] <= time.monotonic():
+            self.delete(key)
+        return self.data.get(key)
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = str(value).encode()
+        if ex is not None:
+            self.expire(key, ex)
+        return True
+
+    def expire(self, key, seconds):
+        if self._get(key) is None:
+            return False
+        self.expires[key] = time.monotonic() + seconds
+        return True
+
+    def rpush(self, key, *values):
+        items = self._get(key) or []
+        items.extend(str(value).encode() for value in values)
+        self.data[key] = items
+        return len(items)
+
+    def lpop(self, key):
+        items = self._get(key)
+        if not items:
+            return None
+        value = items.pop(0)
+        if not items:
+            self.delete(key)
+        return value
+
+    def llen(self, key):
+        return len(self._get(key) or [])
+
+    def delete(self, *keys):
+        deleted = 0
+        for key in keys:
+            self.expires.pop(key, None)
+            deleted += self.data.pop(key, None) is not None
+        return deleted
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.calls.append((getattr(self.client, name), args, kwargs))
+            return self
+
+        return queue
+
+    def execute(self):
+        calls, self.calls = self.calls, []
+        return [method(*args, **kwargs) for method, args, kwargs in calls]
+
+
+class SessionStoreTestCase(unittest.TestCase):
+    """Runs against both session stores, no database needed"""
+
+    def stores(self, ttl=60):
+        return [MemorySessionStore(ttl), RedisSessionStore(FakeRedis(), ttl)]
+
+    def test_pop_in_order(self):
+        for store in self.stores():
+            session_id = store.create([3, 1, 2])
+            self.assertEqual((3, 2), store.pop(session_id))
+            self.assertEqual((1, 1), store.pop(session_id))
+            self.assertEqual((2, 0), store.pop(session_id))
+            self.assertEqual((None, 0), store.pop(session_id))
+
+    def test_empty_session(self):
+        for store in self.stores():
+            session_id = store.create([])
+            self.assertEqual((None, 0), store.pop(session_id))
+
+    def test_unknown_and_deleted_session(self):
+        for store in self.stores():
+            with self.assertRaises(KeyError):
+                store.pop("unknown")
+            session_id = store.create([1])
+            store.delete(session_id)
+            with self.assertRaises(KeyError):
+                store.pop(session_id)
+
+    def test_expired_session(self):
+        for store in self.stores(ttl=0.01):
+            session_id = store.create([1, 2])
+            time.sleep(0.02)
+            with self.assertRaises(KeyError):
+                store.pop(session_id)
+
+    def test_memory_store_evicts_expired_sessions(self):
+        store = MemorySessionStore(ttl=0.01)
+        for _ in range(10):
+            store.create([1])
+        time.sleep(0.02)
+        store.create([1])
+        self.assertEqual(1, len(store))
+
+
+class QuestionBankTestCase(unittest.TestCase):
+    """Validation of imported questions, no database needed"""
+
+    def test_question_hash_normalizes_text(self):
+        self.assertEqual(
+            question_hash("What is  the Capital of Italy?"),
+            question_hash("what is the capital of italy"),
+        )
+        self.assertNotEqual(
+            question_hash("What is the capital of Italy?"),
+            question_hash("What is the capital of France?"),
+        )
+
+    def test_validate(self):
+        row = {"question": " Q? ", "answer": "A", "category": "Art", "difficulty": "2"}
+        mapping, error = QuestionImporter.validate(row)
+        self.assertIsNone(error)
+        self.assertEqual("Q?", mapping["question"])
+        self.assertEqual(2, mapping["difficulty"])
+        # NDJSON values that are not strings
+        mapping, error = QuestionImporter.validate(dict(row, answer=42, difficulty=2))
+        self.assertIsNone(error)
+        self.assertEqual("42", mapping["answer"])
+
+        for field, value in (("answer", ""), ("difficulty", "9"), ("difficulty", "x")):
+            mapping, error = QuestionImporter.validate(dict(row, **{field: value}))
+            self.assertIsNone(mapping)
+            self.assertIn(field, error)
+
+
+def load_psql_dump(path):
+    """Inserts the rows of the COPY blocks of a pg_dump file."""
+    with open(path) as f:
+        lines = iter(f.read().splitlines())
+    for line in lines:
+        copy = re.match(r"COPY public\.(\w+) \((.*)\) FROM stdin;", line)
+        if not copy:
+            continue
+        table = db.metadata.tables[copy.group(1)]
+        columns = copy.group(2).split(", ")
+        rows = []
+        for line in iter(lambda: next(lines), "\\."):
+            values = [None if v == "\\N" else v for v in line.split("\t")]
+            row = dict(zip(columns, values))
+            if table.name == "questions":
+                row["question_hash"] = question_hash(row["question"])
+            rows.append(row)
+        db.session.execute(table.insert(), rows)
+        if db.engine.dialect.name == "postgresql":
+            db.session.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                f"(SELECT max(id) FROM {table.name}))"
+            )
+
+
+class TriviaTestCase(DatabaseTestCase):
+    """This class represents the trivia test case
+
+    The questions and categories of trivia.psql are loaded once, and every
+    test runs in a transaction rolled back after it.
+    """
+
+    app = create_app(
+        worker_db_config(
+            os.environ.get(
+                "TRIVIA_TEST_DATABASE_URL", "postgresql://localhost:5432/trivia_test"
+            )
+        )
+    )
+    db = db
+
+    @classmethod
+    def create_schema(cls):
+        super().create_schema()
+        load_psql_dump(os.path.join(os.path.dirname(__file__), "trivia.psql"))
 
     def setUp(self):
-        """Define test variables and initialize app."""
-        self.app = create_app()
+        """Define test variables and open the transaction of the test."""
+        super().setUp()
         self.client = self.app.test_client
-        self.database_name = "trivia_test"
-        self.database_path = "postgres://{}/{}".format(
-            "localhost:5432", self.database_name
-        )
-        setup_db(self.app, self.database_path)
+        for cache in self.app.extensions["trivia_caches"]:
+            cache.invalidate()
 
-        # binds the app to the current context
-        with self.app.app_context():
-            self.db = SQLAlchemy()
-            self.db.init_app(self.app)
-            # create all tables
-            self.db.create_all()
+    def test_delete_question_not_found(self):
+        res = self.client().delete("/questions/99999")
+        self.assertEqual(404, res.status_code)
 
-    def tearDown(self):
-        # binds the app to the current context
-        with self.app.app_context():
-            self.db = SQLAlchemy()
-            self.db.drop_all()
-        pass
+    def test_export_and_reimport_questions(self):
+        runner = self.app.test_cli_runner()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "questions.ndjson")
+            result = runner.invoke(args=["trivia", "export", path])
+            self.assertEqual(0, result.exit_code, result.output)
+            with open(path) as f:
+                rows = [json.loads(line) for line in f]
+            with self.app.app_context():
+                self.assertEqual(Question.query.count(), len(rows))
+            self.assertTrue(all(isinstance(row["category"], str) for row in rows))
+
+            result = runner.invoke(args=["trivia", "import", path])
+            self.assertEqual(0, result.exit_code, result.output)
+            self.assertIn(f"0 imported, {len(rows)} duplicates", result.output)
+
+    def test_import_rejects_malformed_lines(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "questions.ndjson")
+            with open(path, "w") as f:
+                f.write(
+                    '{"question": "Who wrote Hamlet?", "answer": "Shakespeare", '
+                    '"category": "Art", "difficulty": 2}\n'
+                    '{"question": "Who painted the Mona Lisa?",\n'
+                    '["not", "an", "object"]\n'
+                    '{"question": "Who?", "answer": "Me", "category": 3, '
+                    '"difficulty": 2}\n'
+                )
+            result = self.app.test_cli_runner().invoke(args=["trivia", "import", path])
+        self.assertEqual(0, result.exit_code, result.output)
+        self.assertIn("2 imported, 0 duplicates, 2 rejected", result.output)
+        self.assertIn("line 2 rejected: invalid JSON", result.output)
+        self.assertIn("line 3 rejected: not a JSON object", result.output)
 
     def test_get_categories(self):
         res = self.client().get("/categories")
@@ -40,21 +255,60 @@ class TriviaTestCase(unittest.TestCase):
         categories = json.loads(res.data)["categories"]
         self.assertEqual(6, len(categories))
 
+    def test_get_categories_not_modified(self):
+        res = self.client().get("/categories")
+        etag = res.headers["ETag"]
+        self.assertIn("max-age", res.headers["Cache-Control"])
+
+        res = self.client().get("/categories", headers={"If-None-Match": etag})
+        self.assertEqual(304, res.status_code)
+
+    def test_category_write_invalidates_cache(self):
+        listeners = len(inspect(Category).dispatch.after_insert)
+        CategoryCache().listen()
+        self.assertEqual(listeners, len(inspect(Category).dispatch.after_insert))
+
+        res = self.client().get("/categories")
+        self.assertEqual(6, len(json.loads(res.data)["categories"]))
+        db.session.add(Category(type="Music"))
+        db.session.flush()
+        res = self.client().get("/categories")
+        self.assertEqual(7, len(json.loads(res.data)["categories"]))
+
+    def test_hot_questions_run_no_category_query(self):
+        self.client().get("/questions")
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        with self.app.app_context():
+            engine = db.get_engine(self.app)
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            res = self.client().get("/questions")
+        finally:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+        self.assertEqual(200, res.status_code)
+        self.assertEqual(6, len(json.loads(res.data)["categories"]))
+        self.assertFalse([s for s in statements if "FROM categories" in s])
+
     def test_get_questions_page_1(self):
         res = self.client().get("/questions")
         self.assertEqual(200, res.status_code)
         json_res = json.loads(res.data)
         total_questions = json_res["total_questions"]
         self.assertEqual(10, len(json_res["questions"]))
-        self.assertEqual(18, total_questions)
+        self.assertEqual(19, total_questions)
 
     def test_get_questions_page_2(self):
         res = self.client().get("/questions?page=2")
         self.assertEqual(200, res.status_code)
         json_res = json.loads(res.data)
         total_questions = json_res["total_questions"]
-        self.assertEqual(8, len(json_res["questions"]))
-        self.assertEqual(18, total_questions)
+        self.assertEqual(9, len(json_res["questions"]))
+        self.assertEqual(19, total_questions)
 
     def test_get_questions_page_not_found(self):
         res = self.client().get("/questions?page=999")
@@ -67,12 +321,22 @@ class TriviaTestCase(unittest.TestCase):
         total_questions = json_res["total_questions"]
         self.assertEqual(2, total_questions)
 
+    def test_get_question_for_categories_page_not_found(self):
+        res = self.client().get("/categories/6/questions?page=2")
+        self.assertEqual(404, res.status_code)
+
+    def test_get_question_for_unknown_category_not_found(self):
+        res = self.client().get("/categories/999/questions")
+        self.assertEqual(404, res.status_code)
+
     def test_delete_question(self):
         res = self.client().delete("/questions/5")
         self.assertEqual(200, res.status_code)
         json_res = json.loads(res.data)
         total_questions = json_res["total_questions"]
         self.assertEqual(18, total_questions)
+        self.assertEqual(5, json_res["deleted"])
+        self.assertNotIn("questions", json_res)
 
         res = self.client().post("/questions/search", json={"searchTerm": "caged bird"})
         self.assertEqual(200, res.status_code)
@@ -95,7 +359,65 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(200, res.status_code)
         json_res = json.loads(res.data)
         total_questions = json_res["total_questions"]
-        self.assertEqual(19, total_questions)
+        self.assertEqual(20, total_questions)
+        self.assertEqual("test_question", json_res["question"]["question"])
+        self.assertEqual(json_res["created"], json_res["question"]["id"])
+
+    def test_post_question_bad_category(self):
+        res = self.client().post(
+            "/questions",
+            json={
+                "question": "test_question",
+                "answer": "test_answer",
+                "category": "Sports",
+                "difficulty": 3,
+            },
+        )
+        self.assertEqual(422, res.status_code)
+
+        res = self.client().post(
+            "/questions",
+            json={
+                "question": "test_question",
+                "answer": "test_answer",
+                "category": "999",
+                "difficulty": 3,
+            },
+        )
+        self.assertEqual(422, res.status_code)
+
+    def test_post_question_missing_fields(self):
+        for field in ("question", "answer"):
+            body = {
+                "question": "test_question",
+                "answer": "test_answer",
+                "category": "6",
+                "difficulty": 3,
+            }
+            del body[field]
+            res = self.client().post("/questions", json=body)
+            self.assertEqual(422, res.status_code)
+
+    def test_post_and_delete_question_include_questions(self):
+        res = self.client().post(
+            "/questions?include=questions&page=2",
+            json={
+                "question": "paged_question",
+                "answer": "test_answer",
+                "category": "6",
+                "difficulty": 3,
+            },
+        )
+        self.assertEqual(200, res.status_code)
+        json_res = json.loads(res.data)
+        self.assertEqual(json_res["total_questions"] - 10, len(json_res["questions"]))
+
+        res = self.client().delete(
+            f"/questions/{json_res['created']}?include=questions&page=2"
+        )
+        self.assertEqual(200, res.status_code)
+        json_res = json.loads(res.data)
+        self.assertEqual(json_res["total_questions"] - 10, len(json_res["questions"]))
 
     def test_search_questions(self):
         res = self.client().post("/questions/search", json={"searchTerm": "title"})
@@ -113,7 +435,36 @@ class TriviaTestCase(unittest.TestCase):
         total_questions = data["total_questions"]
         questions = data["questions"]
         self.assertEqual(19, total_questions)
-        self.assertEqual(19, len(questions))
+        self.assertEqual(10, len(questions))
+
+        res = self.client().post("/questions/search?page=2", json={"searchTerm": ""})
+        self.assertEqual(9, len(json.loads(res.data)["questions"]))
+
+    def test_search_questions_answers(self):
+        res = self.client().post(
+            "/questions/search", json={"searchTerm": "scissorhands"}
+        )
+        data = json.loads(res.data)
+        self.assertEqual(1, data["total_questions"])
+        self.assertEqual("Edward Scissorhands", data["questions"][0]["answer"])
+
+    def test_search_questions_filters(self):
+        res = self.client().post(
+            "/questions/search", json={"searchTerm": "", "category": 6}
+        )
+        data = json.loads(res.data)
+        self.assertEqual(2, data["total_questions"])
+        self.assertTrue(all(q["category"] == 6 for q in data["questions"]))
+
+        res = self.client().post(
+            "/questions/search",
+            json={"searchTerm": "", "category": 6, "difficulty": 99},
+        )
+        self.assertEqual(0, json.loads(res.data)["total_questions"])
+
+    def test_search_questions_page_not_found(self):
+        res = self.client().post("/questions/search?page=99", json={"searchTerm": ""})
+        self.assertEqual(404, res.status_code)
 
     def test_get_next_question(self):
         q_id = -1
@@ -161,6 +512,119 @@ class TriviaTestCase(unittest.TestCase):
         data = json.loads(res.data)
         self.assertIsNone(data.get("question"))
 
+    def test_get_next_question_all_categories(self):
+        previous_questions = []
+        for questions_left in range(18, -1, -1):
+            res = self.client().post(
+                "/quizzes",
+                json={
+                    "previous_questions": previous_questions,
+                    "quiz_category": {"type": "click", "id": 0},
+                },
+            )
+            data = json.loads(res.data)
+            self.assertNotIn(data["question"]["id"], previous_questions)
+            self.assertEqual(questions_left, data["questions_left"])
+            previous_questions.append(data["question"]["id"])
+
+    def test_quiz_session(self):
+        res = self.client().post(
+            "/quizzes/sessions", json={"quiz_category": {"type": "Sports", "id": 6}}
+        )
+        self.assertEqual(200, res.status_code)
+        data = json.loads(res.data)
+        session_id = data["session_id"]
+        self.assertEqual(2, data["total_questions"])
+
+        asked = set()
+        for questions_left in (1, 0):
+            res = self.client().post(f"/quizzes/sessions/{session_id}/next")
+            data = json.loads(res.data)
+            self.assertEqual(6, data["question"]["category"])
+            self.assertNotIn(data["question"]["id"], asked)
+            self.assertEqual(questions_left, data["questions_left"])
+            asked.add(data["question"]["id"])
+
+        res = self.client().post(f"/quizzes/sessions/{session_id}/next")
+        data = json.loads(res.data)
+        self.assertIsNone(data.get("question"))
+
+        res = self.client().delete(f"/quizzes/sessions/{session_id}")
+        self.assertEqual(200, res.status_code)
+        res = self.client().post(f"/quizzes/sessions/{session_id}/next")
+        self.assertEqual(404, res.status_code)
+
+    def test_quiz_session_skips_deleted_questions(self):
+        res = self.client().post(
+            "/quizzes/sessions", json={"quiz_category": {"type": "Sports", "id": 6}}
+        )
+        session_id = json.loads(res.data)["session_id"]
+        deleted, kept = Question.query.filter(Question.category == 6).all()
+        res = self.client().delete(f"/questions/{deleted.id}")
+        self.assertEqual(200, res.status_code)
+
+        res = self.client().post(f"/quizzes/sessions/{session_id}/next")
+        data = json.loads(res.data)
+        self.assertEqual(kept.id, data["question"]["id"])
+        # the deleted question is counted until it is reached
+        self.assertLessEqual(data["questions_left"], 1)
+
+        res = self.client().post(f"/quizzes/sessions/{session_id}/next")
+        data = json.loads(res.data)
+        self.assertIsNone(data.get("question"))
+        self.assertEqual(0, data["questions_left"])
+
+    def test_quiz_session_round_cost_does_not_grow(self):
+        """A round runs the same statements, with the same parameters, in a
+        session of 2 questions and in one of every question."""
+        rounds = []
+        for category in (6, 0):
+            res = self.client().post(
+                "/quizzes/sessions", json={"quiz_category": {"id": category}}
+            )
+            session_id = json.loads(res.data)["session_id"]
+            statements = []
+
+            def before_cursor_execute(conn, cursor, statement, parameters, *args):
+                statements.append((statement, len(parameters)))
+
+            with self.app.app_context():
+                engine = db.get_engine(self.app)
+            event.listen(engine, "before_cursor_execute", before_cursor_execute)
+            try:
+                res = self.client().post(f"/quizzes/sessions/{session_id}/next")
+            finally:
+                event.remove(engine, "before_cursor_execute", before_cursor_execute)
+            self.assertEqual(200, res.status_code)
+            rounds.append(statements)
+
+        self.assertEqual(1, len(rounds[0]))
+        self.assertEqual(rounds[0], rounds[1])
+
+    def test_get_next_question_bad_category(self):
+        res = self.client().post(
+            "/quizzes",
+            json={"previous_questions": [], "quiz_category": {"id": "sports"}},
+        )
+        self.assertEqual(400, res.status_code)
+
+        res = self.client().post(
+            "/quizzes",
+            json={"previous_questions": [], "quiz_category": {"id": 999}},
+        )
+        self.assertEqual(400, res.status_code)
+
+    def test_get_next_question_bad_previous_questions(self):
+        for previous_questions in ([[1]], [{"id": 1}], ["5"], {"5": 1}, "5"):
+            res = self.client().post(
+                "/quizzes",
+                json={
+                    "previous_questions": previous_questions,
+                    "quiz_category": {"id": 6},
+                },
+            )
+            self.assertEqual(400, res.status_code, previous_questions)
+
 
 # Make the tests conveniently executable
 if __name__ == "__main__":
@@ -0,0 +1,7 @@
+"""Benchmarks of the coffee shop API.
+
+From the backend directory, with the repository root on PYTHONPATH:
+
+    python -m benchmarks.auth --requests 500 --jwks-latency 50
+    python -m benchmarks.menu --drinks 10000 --requests 20
+"""
@@ -0,0 +1,94 @@
+"""Authenticated request latency.
+
+Sends `--requests` requests with a valid token to an endpoint protected by
+requires_auth, signed by a local JWKS stand-in that answers after
+`--jwks-latency` ms: fetching the JWKS and verifying the signature on
+every request like the app used to, with the JWKS cached by the key store,
+then with the verified tokens cached as well. The time spent in every
+stage of the verification is reported from the timing hooks:
+
+    python -m benchmarks.auth --requests 500 --jwks-latency 50
+"""
+import argparse
+import statistics
+import time
+from collections import defaultdict
+
+from flask import Flask, jsonify
+
+from fsnd_common.auth import Auth, JWKSKeyStore
+from fsnd_common.loadtest import percentile
+from jwks_stub import JWKSServer, SigningKey
+from src.auth.auth import API_AUDIENCE, AUTH0_DOMAIN, JWKS_TTL, TOKEN_CACHE_SIZE
+
+STAGES = ("cache", "header", "key", "signature", "claims")
+
+
+def make_app(auth):
+    app = Flask(__name__)
+
+    @app.route("/drinks-detail")
+    @auth.requires_auth("get:drinks-detail")
+    def drinks_detail(payload):
+        return jsonify({"success": True, "drinks": []})
+
+    return app
+
+
+def run(client, token, requests):
+    latencies = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = client.get(
+            "/drinks-detail", headers={"Authorization": f"Bearer {token}"}
+        )
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.status_code
+    return {
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "throughput": len(latencies) / sum(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--jwks-latency", type=float, default=50)
+    args = parser.parse_args()
+
+    key = SigningKey("bench")
+    token = key.token(["get:drinks-detail"])
+    print(
+        f"{'mode':<14} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+        f"{'fetches':>8}  " + " ".join(f"{stage:>9}" for stage in STAGES)
+    )
+    with JWKSServer([key], latency=args.jwks_latency / 1000) as server:
+        modes = (
+            ("uncached", 0, 0),
+            ("cached keys", JWKS_TTL, 0),
+            ("cached tokens", JWKS_TTL, TOKEN_CACHE_SIZE),
+        )
+        for name, ttl, cache_size in modes:
+            server.requests = 0
+            keys = JWKSKeyStore(server.url, ttl=ttl)
+            auth = Auth(AUTH0_DOMAIN, API_AUDIENCE, keys=keys, cache_size=cache_size)
+            stages = defaultdict(float)
+            auth.timing_hooks.append(
+                lambda stage, seconds: stages.__setitem__(stage, stages[stage] + seconds)
+            )
+            r = run(make_app(auth).test_client(), token, args.requests)
+            print(
+                f"{name:<14} {r['throughput']:>8.0f} {r['p50_ms']:>8.2f} "
+                f"{r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} {server.requests:>8}  "
+                + " ".join(
+                    f"{stages[stage] / args.requests * 1000:>7.3f}ms"
+                    for stage in STAGES
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
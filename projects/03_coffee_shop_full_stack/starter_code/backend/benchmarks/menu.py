@@ -0,0 +1,111 @@
+"""Menu listing latency.
+
+Fills a fresh SQLite database with `--drinks` drinks and measures GET
+/drinks and GET /drinks-detail through the test client of the app: built
+from the database after every write, served from the menu cache, and
+answered 304 Not Modified to clients sending the ETag they have:
+
+    python -m benchmarks.menu --drinks 10000 --requests 20
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from fsnd_common.auth import StaticKeys
+from fsnd_common.loadtest import percentile
+from jwks_stub import SigningKey
+
+COLORS = ("#ffffff", "#fff2c7", "#d7a35f", "#7a4a23", "#3b1f0e", "#c8e6c9")
+INGREDIENTS = ("espresso", "milk", "foam", "water", "chocolate", "cream", "ice")
+
+
+def make_recipe(rng):
+    return [
+        {"name": name, "color": rng.choice(COLORS), "parts": rng.randint(1, 3)}
+        for name in rng.sample(INGREDIENTS, rng.randint(1, 4))
+    ]
+
+
+def seed(db, Drink, drinks, seed=0):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(drinks):
+        recipe = make_recipe(rng)
+        rows.append(
+            {
+                "title": f"drink {i}",
+                "recipe": recipe,
+                "recipe_short": Drink.short_recipe(recipe),
+            }
+        )
+    db.session.bulk_insert_mappings(Drink, rows)
+    db.session.commit()
+
+
+def run(client, path, requests, headers=None, before=None, status=200):
+    latencies = []
+    for _ in range(requests):
+        if before:
+            before()
+        started = time.perf_counter()
+        response = client.get(path, headers=headers)
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == status, response.status_code
+    return {
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "kb": len(response.data) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--drinks", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # the app creates its tables when imported
+        os.environ["DATABASE_URL"] = f"sqlite:///{directory}/bench.db"
+        from src import api
+        from src.auth import auth
+        from src.database.models import db, Drink
+
+        key = SigningKey("bench")
+        auth.auth.keys = StaticKeys({"keys": [key.jwk()]})
+        headers = {"Authorization": f"Bearer {key.token(['get:drinks-detail'])}"}
+        with api.app.app_context():
+            seed(db, Drink, args.drinks)
+
+        client = api.app.test_client()
+        print(
+            f"{'endpoint':<16} {'response':<14} {'p50 ms':>8} {'p95 ms':>8} "
+            f"{'mean ms':>8} {'KB':>8}"
+        )
+        for path, path_headers in (("/drinks", None), ("/drinks-detail", headers)):
+            etag = client.get(path, headers=path_headers).headers["ETag"]
+            runs = (
+                ("built", {"before": api.menu_cache.invalidate}),
+                ("cached", {}),
+                (
+                    "not modified",
+                    {
+                        "headers": {"If-None-Match": etag, **(path_headers or {})},
+                        "status": 304,
+                    },
+                ),
+            )
+            for name, options in runs:
+                options.setdefault("headers", path_headers)
+                r = run(client, path, args.requests, **options)
+                print(
+                    f"{path:<16} {name:<14} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} "
+                    f"{r['mean_ms']:>8.2f} {r['kb']:>8.0f}"
+                )
+
+if __name__ == "__main__":
+    main()
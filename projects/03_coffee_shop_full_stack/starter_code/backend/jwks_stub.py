@@ -0,0 +1,93 @@
+"""Local stand-in for the Auth0 JWKS endpoint, used by the tests and the
+benchmarks to sign and verify tokens without network access.
+"""
+import base64
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from Crypto.PublicKey import RSA
+from jose import jwt
+
+from src.auth.auth import ALGORITHMS, API_AUDIENCE, AUTH0_DOMAIN
+
+
+def b64_int(value):
+    data = value.to_bytes((value.bit_length() + 7) // 8, "big")
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+class SigningKey:
+    """An RSA key pair, and the tokens it signs."""
+
+    def __init__(self, kid, bits=2048):
+        self.kid = kid
+        self.key = RSA.generate(bits)
+        self.pem = self.key.exportKey("PEM").decode()
+
+    def jwk(self):
+        return {
+            "kty": "RSA",
+            "kid": self.kid,
+            "use": "sig",
+            "alg": ALGORITHMS[0],
+            "n": b64_int(self.key.n),
+            "e": b64_int(self.key.e),
+        }
+
+    def token(self, permissions=(), expires_in=3600, **claims):
+        now = int(time.time())
+        payload = {
+            "iss": f"https://{AUTH0_DOMAIN}/",
+            "sub": "auth0|test",
+            "aud": API_AUDIENCE,
+            "iat": now,
+            "exp": now + expires_in,
+        }
+        if permissions is not None:
+            payload["permissions"] = list(permissions)
+        payload.update(claims)
+        return jwt.encode(
+            payload, self.pem, algorithm=ALGORITHMS[0], headers={"kid": self.kid}
+        )
+
+
+class JWKSServer:
+    """Serves the public keys of `keys` as a JWKS on a local port.
+
+    `latency` seconds are slept before every response, to stand in for
+    the round trip to Auth0; `requests` counts the fetches.
+    """
+
+    def __init__(self, keys, latency=0.0):
+        self.keys = list(keys)
+        self.latency = latency
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests += 1
+                time.sleep(server.latency)
+                body = json.dumps({"keys": [key.jwk() for key in server.keys]})
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(body.encode())
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/.well-known/jwks.json"
+
+    def __enter__(self):
+        threading.Thread(
+            target=self.httpd.serve_forever, args=(0.05,), daemon=True
+        ).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
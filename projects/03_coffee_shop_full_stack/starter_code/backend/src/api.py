@@ -5,28 +5,37 @@ import json
 from flask_cors import CORS
 
 from .database.models import db_drop_and_create_all, setup_db, Drink
-from .auth.auth import AuthError, requires_auth
+from .auth.auth import AuthError, auth, jwks, requires_auth
+from .menu import MenuCache
 
 app = Flask(__name__)
 setup_db(app)
 CORS(app)
+menu_cache = MenuCache(int(os.environ.get("MENU_CACHE_TTL", 60)))
 
 db_drop_and_create_all()
 
+
+@app.before_request
+def start_jwks_refresh():
+    # started by the server rather than on import, and only while the keys are
+    # the Auth0 ones: the tests replace them with their own
+    if auth.keys is jwks:
+        jwks.start()
+
+
 ## ROUTES
 
 
 @app.route("/drinks")
 def get_drinks():
-    drinks = Drink.query.all()
-    return jsonify({"success": True, "drinks": [drink.short() for drink in drinks]})
+    return menu_cache.response()
 
 
 @app.route("/drinks-detail")
 @requires_auth("get:drinks-detail")
 def get_drink_detail(jwt):
-    drinks = Drink.query.all()
-    return jsonify({"success": True, "drinks": [drink.long() for drink in drinks]})
+    return menu_cache.response(detail=True)
 
 
 @app.route("/drinks", methods=["POST"])
@@ -40,8 +49,12 @@ def post_drink(jwt):
     title = body.get("title")
     recipe = body.get("recipe")
 
-    drink = Drink(title=title, recipe=json.dumps(recipe))
+    try:
+        drink = Drink(title=title, recipe=recipe)
+    except ValueError:
+        abort(422)
     drink.insert()
+    menu_cache.invalidate()
 
     return jsonify({"success": True, "drinks": [drink.long()],})
 
@@ -56,15 +69,18 @@ def patch_drink(jwt, drink_id):
 
     body = request.get_json()
 
-    title = body.get("title")
-    recipe = body.get("recipe")
-
     if "title" not in body and "recipe" not in body:
         abort(422)
 
-    drink.title = title
-    drink.title = recipe
+    try:
+        if "title" in body:
+            drink.title = body["title"]
+        if "recipe" in body:
+            drink.recipe = body["recipe"]
+    except ValueError:
+        abort(422)
     drink.update()
+    menu_cache.invalidate()
 
     return jsonify({"success": True, "drinks": [drink.long()]})
 
@@ -78,6 +94,7 @@ def delete(jwt, drink_id):
         abort(404)
 
     drink.delete()
+    menu_cache.invalidate()
 
     return jsonify({"success": True, "delete": drink_id})
 
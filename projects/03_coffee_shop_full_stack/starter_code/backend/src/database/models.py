@@ -1,11 +1,14 @@
 import os
-from sqlalchemy import Column, String, Integer
+from sqlalchemy import Column, String, Integer, JSON
+from sqlalchemy.orm import validates
 from flask_sqlalchemy import SQLAlchemy
 import json
 
+from fsnd_common.db import configure_db, database_uri
+
 database_filename = "database.db"
 project_dir = os.path.dirname(os.path.abspath(__file__))
-database_path = "sqlite:///{}".format(os.path.join(project_dir, database_filename))
+database_path = database_uri("sqlite:///{}".format(os.path.join(project_dir, database_filename)))
 
 db = SQLAlchemy()
 
@@ -14,8 +17,7 @@ setup_db(app)
     binds a flask application and a SQLAlchemy service
 '''
 def setup_db(app):
-    app.config["SQLALCHEMY_DATABASE_URI"] = database_path
-    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    configure_db(app, database_path)
     db.app = app
     db.init_app(app)
 
@@ -38,21 +40,47 @@ class Drink(db.Model):
     id = Column(Integer().with_variant(Integer, "sqlite"), primary_key=True)
     # String Title
     title = Column(String(80), unique=True)
-    # the ingredients blob - this stores a lazy json blob
+    # the ingredients, decoded once when the drink is loaded
     # the required datatype is [{'color': string, 'name':string, 'parts':number}]
-    recipe =  Column(String(180), nullable=False)
+    recipe = Column(JSON, nullable=False)
+    # the short form of the recipe, without the names, kept up to date by
+    # validate_recipe so that short() does not rebuild it on every request
+    recipe_short = Column(JSON, nullable=False)
+
+    '''
+    short_recipe(recipe)
+        the short form of a recipe, the colors and parts of its ingredients
+    '''
+    @staticmethod
+    def short_recipe(recipe):
+        return [{'color': r['color'], 'parts': r['parts']} for r in recipe]
+
+    '''
+    validate_recipe()
+        checks a recipe when it is set, and updates its short form
+        a single ingredient is stored as a recipe of one ingredient
+    '''
+    @validates('recipe')
+    def validate_recipe(self, key, recipe):
+        if isinstance(recipe, dict):
+            recipe = [recipe]
+        if not isinstance(recipe, list) or not all(isinstance(r, dict) for r in recipe):
+            raise ValueError('recipe must be a list of ingredients')
+        try:
+            self.recipe_short = self.short_recipe(recipe)
+        except KeyError as e:
+            raise ValueError('ingredient without {}'.format(e))
+        return recipe
 
     '''
     short()
         short form representation of the Drink model
     '''
     def short(self):
-        print(json.loads(self.recipe))
-        short_recipe = [{'color': r['color'], 'parts': r['parts']} for r in json.loads(self.recipe)]
         return {
             'id': self.id,
             'title': self.title,
-            'recipe': short_recipe
+            'recipe': self.recipe_short
         }
 
     '''
@@ -63,9 +91,23 @@ class Drink(db.Model):
         return {
             'id': self.id,
             'title': self.title,
-            'recipe': json.loads(self.recipe)
+            'recipe': self.recipe
         }
 
+    '''
+    menu(detail)
+        short form representation of all the drinks, or long form with
+        detail, read as plain rows rather than as Drink models
+    '''
+    @classmethod
+    def menu(cls, detail=False):
+        recipe = cls.recipe if detail else cls.recipe_short
+        rows = db.session.query(cls.id, cls.title, recipe).order_by(cls.id)
+        return [
+            {'id': id, 'title': title, 'recipe': recipe}
+            for id, title, recipe in rows
+        ]
+
     '''
     insert()
         inserts a new model into a database
@@ -0,0 +1,56 @@
+import hashlib
+import json
+import threading
+import time
+
+from flask import Response, request
+
+from .database.models import Drink
+
+
+class MenuCache:
+    """Keeps the JSON responses of the short and long drink menus, encoded.
+
+    The menus are rebuilt after `ttl` seconds, which bounds how long a
+    change made by another process goes unnoticed, and right away once
+    `invalidate` is called, which the routes writing drinks do after
+    committing. A menu read while a write invalidated it is not kept.
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._version = 0
+        self._menus = {}
+
+    def invalidate(self):
+        with self._lock:
+            self._version += 1
+            self._menus = {}
+
+    def get(self, detail=False):
+        """Returns the encoded menu, long form with `detail`, and its ETag."""
+        with self._lock:
+            cached = self._menus.get(detail)
+            version = self._version
+        if cached is not None and time.monotonic() - cached[2] < self.ttl:
+            return cached[0], cached[1]
+
+        body = json.dumps(
+            {"success": True, "drinks": Drink.menu(detail)}, separators=(",", ":")
+        ).encode()
+        etag = hashlib.sha1(body).hexdigest()
+        with self._lock:
+            if self._version == version:
+                self._menus[detail] = (body, etag, time.monotonic())
+        return body, etag
+
+    def response(self, detail=False):
+        """Returns the menu response, or a 304 when the client already has
+        it, in which case a cached menu is served without a query.
+        """
+        body, etag = self.get(detail)
+        response = Response(body, mimetype="application/json")
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
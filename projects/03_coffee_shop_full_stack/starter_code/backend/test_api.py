@@ -0,0 +1,160 @@
+import os
+import unittest
+
+from sqlalchemy import event
+
+# the app creates its tables when imported
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+# never reach Auth0, should anything fetch the keys
+os.environ.setdefault("JWKS_URL", "http://127.0.0.1:9/.well-known/jwks.json")
+
+from fsnd_common.auth import StaticKeys
+from jwks_stub import SigningKey
+from src import api
+from src.auth import auth
+from src.database.models import db, Drink
+
+PERMISSIONS = ("get:drinks-detail", "post:drinks", "patch:drinks", "delete:drinks")
+RECIPE = [
+    {"name": "espresso", "color": "#7a4a23", "parts": 1},
+    {"name": "milk", "color": "#ffffff", "parts": 3},
+]
+
+
+class DrinksTestCase(unittest.TestCase):
+    """This class represents the drinks test case"""
+
+    @classmethod
+    def setUpClass(cls):
+        key = SigningKey("key-1")
+        auth.auth.keys = StaticKeys({"keys": [key.jwk()]})
+        cls.headers = {"Authorization": f"Bearer {key.token(PERMISSIONS)}"}
+
+    def setUp(self):
+        self.client = api.app.test_client()
+        with api.app.app_context():
+            db.drop_all()
+            db.create_all()
+            db.session.add(Drink(title="latte", recipe=RECIPE))
+            db.session.commit()
+        api.menu_cache.invalidate()
+
+    def test_jwks_refresh_not_started_by_tests(self):
+        self.client.get("/drinks")
+        self.assertIsNone(auth.jwks._thread)
+
+    def test_get_drinks(self):
+        res = self.client.get("/drinks")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            res.get_json()["drinks"][0]["recipe"],
+            [{"color": "#7a4a23", "parts": 1}, {"color": "#ffffff", "parts": 3}],
+        )
+
+    def test_get_drinks_detail(self):
+        res = self.client.get("/drinks-detail", headers=self.headers)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()["drinks"][0]["recipe"], RECIPE)
+
+    def test_post_drink(self):
+        recipe = {"name": "water", "color": "#c8e6c9", "parts": 1}
+        res = self.client.post(
+            "/drinks", json={"title": "water", "recipe": recipe}, headers=self.headers
+        )
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()["drinks"][0]["recipe"], [recipe])
+        drinks = self.client.get("/drinks").get_json()["drinks"]
+        self.assertEqual(drinks[1]["recipe"], [{"color": "#c8e6c9", "parts": 1}])
+
+    def test_post_invalid_recipe(self):
+        res = self.client.post(
+            "/drinks",
+            json={"title": "water", "recipe": [{"name": "water"}]},
+            headers=self.headers,
+        )
+        self.assertEqual(res.status_code, 422)
+
+    def test_patch_title_keeps_recipe(self):
+        res = self.client.patch(
+            "/drinks/1", json={"title": "flat white"}, headers=self.headers
+        )
+        drink = res.get_json()["drinks"][0]
+        self.assertEqual(drink["title"], "flat white")
+        self.assertEqual(drink["recipe"], RECIPE)
+
+    def test_patch_recipe_updates_short_form(self):
+        recipe = [{"name": "espresso", "color": "#7a4a23", "parts": 2}]
+        res = self.client.patch(
+            "/drinks/1", json={"recipe": recipe}, headers=self.headers
+        )
+        self.assertEqual(
+            res.get_json()["drinks"][0], {"id": 1, "title": "latte", "recipe": recipe}
+        )
+        drinks = self.client.get("/drinks").get_json()["drinks"]
+        self.assertEqual(drinks[0]["recipe"], [{"color": "#7a4a23", "parts": 2}])
+
+    def count_queries(self):
+        queries = []
+        with api.app.app_context():
+            engine = db.get_engine(api.app)
+
+        def listener(conn, cursor, statement, *args):
+            queries.append(statement)
+
+        event.listen(engine, "before_cursor_execute", listener)
+        self.addCleanup(event.remove, engine, "before_cursor_execute", listener)
+        return queries
+
+    def test_menu_is_served_from_cache(self):
+        self.client.get("/drinks")
+        queries = self.count_queries()
+        res = self.client.get("/drinks")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(queries, [])
+
+    def test_menu_not_modified(self):
+        res = self.client.get("/drinks")
+        etag = res.headers["ETag"]
+        self.assertFalse(etag.startswith("W/"))
+        queries = self.count_queries()
+        res = self.client.get("/drinks", headers={"If-None-Match": etag})
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.data, b"")
+        self.assertEqual(queries, [])
+
+    def test_menu_detail_not_modified(self):
+        res = self.client.get("/drinks-detail", headers=self.headers)
+        etag = res.headers["ETag"]
+        self.assertNotEqual(etag, self.client.get("/drinks").headers["ETag"])
+        res = self.client.get(
+            "/drinks-detail", headers={"If-None-Match": etag, **self.headers}
+        )
+        self.assertEqual(res.status_code, 304)
+        res = self.client.get("/drinks-detail", headers={"If-None-Match": etag})
+        self.assertEqual(res.status_code, 401)
+
+    def test_writes_invalidate_menu(self):
+        etag = self.client.get("/drinks").headers["ETag"]
+        self.client.post(
+            "/drinks",
+            json={"title": "water", "recipe": RECIPE[:1]},
+            headers=self.headers,
+        )
+        res = self.client.get("/drinks", headers={"If-None-Match": etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(res.get_json()["drinks"]), 2)
+
+        etag = res.headers["ETag"]
+        self.client.patch("/drinks/2", json={"title": "tea"}, headers=self.headers)
+        res = self.client.get("/drinks", headers={"If-None-Match": etag})
+        self.assertEqual(res.get_json()["drinks"][1]["title"], "tea")
+
+        etag = res.headers["ETag"]
+        self.client.delete("/drinks/2", headers=self.headers)
+        res = self.client.get("/drinks", headers={"If-None-Match": etag})
+        self.assertEqual(len(res.get_json()["drinks"]), 1)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
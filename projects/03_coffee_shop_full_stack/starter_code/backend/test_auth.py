@@ -0,0 +1,300 @@
+import base64
+import json
+import threading
+import time
+import unittest
+
+from flask import Flask, jsonify
+
+from fsnd_common.auth import Auth, AuthError, JWKSKeyStore, StaticKeys
+from jwks_stub import JWKSServer, SigningKey
+from src.auth.auth import API_AUDIENCE, AUTH0_DOMAIN
+
+_signing_keys = []
+
+
+def signing_keys():
+    """Returns two RSA keys, generated once for all the tests."""
+    if not _signing_keys:
+        _signing_keys.extend([SigningKey("key-1"), SigningKey("key-2")])
+    return _signing_keys
+
+
+class JWKSKeyStoreTestCase(unittest.TestCase):
+    """This class represents the JWKS key store test case"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.key, cls.rotated_key = signing_keys()
+
+    def setUp(self):
+        self.server = JWKSServer([self.key]).__enter__()
+        self.keys = JWKSKeyStore(self.server.url, ttl=600, min_refresh_interval=30)
+        self.auth = Auth(AUTH0_DOMAIN, API_AUDIENCE, keys=self.keys, cache_size=0)
+
+    def tearDown(self):
+        self.keys.stop()
+        self.server.__exit__(None, None, None)
+
+    def test_verify_fetches_keys_once(self):
+        token = self.key.token(["get:drinks-detail"])
+        for _ in range(5):
+            payload = self.auth.verify_decode_jwt(token)
+        self.assertEqual(payload["permissions"], ["get:drinks-detail"])
+        self.assertEqual(self.server.requests, 1)
+
+    def test_expired_keys_are_fetched_again(self):
+        self.keys.ttl = 0.05
+        self.keys.get("key-1")
+        time.sleep(0.1)
+        self.keys.get("key-1")
+        self.assertEqual(self.server.requests, 2)
+
+    def test_unknown_kid_forces_refresh(self):
+        self.auth.verify_decode_jwt(self.key.token())
+        self.server.keys.append(self.rotated_key)
+        self.keys.min_refresh_interval = 0
+        payload = self.auth.verify_decode_jwt(self.rotated_key.token())
+        self.assertEqual(payload["sub"], "auth0|test")
+        self.assertEqual(self.server.requests, 2)
+
+    def test_unknown_kid_refreshes_are_rate_limited(self):
+        self.keys.get("key-1")
+        for _ in range(5):
+            with self.assertRaises(AuthError) as cm:
+                self.auth.verify_decode_jwt(self.rotated_key.token())
+            self.assertEqual(cm.exception.status_code, 400)
+        self.assertEqual(self.server.requests, 1)
+
+    def test_concurrent_refreshes_fetch_once(self):
+        self.server.latency = 0.2
+        keys = []
+        threads = [
+            threading.Thread(target=lambda: keys.append(self.keys.get("key-1")))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(keys), 8)
+        self.assertIsNotNone(keys[0])
+        self.assertTrue(all(key is keys[0] for key in keys))
+        self.assertEqual(self.server.requests, 1)
+
+    def test_keys_are_kept_when_refresh_fails(self):
+        self.keys.get("key-1")
+        self.keys.ttl = 0
+        self.keys.url = "http://127.0.0.1:1/jwks.json"
+        self.assertIsNotNone(self.keys.get("key-1"))
+
+    def test_unavailable_jwks(self):
+        keys = JWKSKeyStore("http://127.0.0.1:1/jwks.json", timeout=1)
+        auth = Auth(AUTH0_DOMAIN, API_AUDIENCE, keys=keys)
+        with self.assertRaises(AuthError) as cm:
+            auth.verify_decode_jwt(self.key.token())
+        self.assertEqual(cm.exception.status_code, 503)
+
+    def test_background_refresh(self):
+        self.keys.min_refresh_interval = 0
+        self.keys.start(interval=0.05)
+        time.sleep(0.3)
+        self.keys.stop()
+        self.assertGreater(self.server.requests, 2)
+        requests = self.server.requests
+        self.keys.get("key-1")
+        self.assertEqual(self.server.requests, requests)
+
+    def test_expired_token(self):
+        with self.assertRaises(AuthError) as cm:
+            self.auth.verify_decode_jwt(self.key.token(expires_in=-60))
+        self.assertEqual(cm.exception.error["code"], "token_expired")
+
+    def test_malformed_token(self):
+        with self.assertRaises(AuthError) as cm:
+            self.auth.verify_decode_jwt("not-a-token")
+        self.assertEqual(cm.exception.status_code, 401)
+
+    def test_non_string_kid(self):
+        _, payload, signature = self.key.token().split(".")
+        header = b64encode({"alg": "RS256", "typ": "JWT", "kid": ["key-1"]})
+        with self.assertRaises(AuthError) as cm:
+            self.auth.verify_decode_jwt(f"{header}.{payload}.{signature}")
+        self.assertEqual(cm.exception.status_code, 401)
+        self.assertEqual(cm.exception.error["description"], "Authorization malformed.")
+
+
+class VerifiedTokenCacheTestCase(unittest.TestCase):
+    """This class represents the verified token cache test case"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.key, cls.rotated_key = signing_keys()
+
+    def setUp(self):
+        self.server = JWKSServer([self.key]).__enter__()
+        self.keys = JWKSKeyStore(self.server.url, ttl=600, min_refresh_interval=0)
+        self.auth = Auth(AUTH0_DOMAIN, API_AUDIENCE, keys=self.keys, cache_size=4)
+        self.cache = self.auth.tokens
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def test_repeated_token_hits_cache(self):
+        token = self.key.token(["get:drinks-detail"])
+        first = self.auth.verify_decode_jwt(token)
+        second = self.auth.verify_decode_jwt(token)
+        self.assertEqual(first, second)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_cached_payload_is_a_copy(self):
+        token = self.key.token(["get:drinks-detail"])
+        self.auth.verify_decode_jwt(token)
+        self.auth.verify_decode_jwt(token)["permissions"] = []
+        payload = self.auth.verify_decode_jwt(token)
+        self.assertEqual(payload["permissions"], ["get:drinks-detail"])
+
+    def test_expired_token_is_not_served(self):
+        token = self.key.token(expires_in=-60)
+        # as if it was verified before expiring
+        payload = {"exp": time.time() - 60}
+        self.cache.put(token, "key-1", self.keys.get("key-1"), payload)
+        with self.assertRaises(AuthError) as cm:
+            self.auth.verify_decode_jwt(token)
+        self.assertEqual(cm.exception.error["code"], "token_expired")
+        self.assertEqual(len(self.cache), 0)
+
+    def test_rotated_key_invalidates_tokens(self):
+        token = self.key.token()
+        self.auth.verify_decode_jwt(token)
+        self.server.keys = [self.rotated_key]
+        self.keys.refresh(force=True)
+        with self.assertRaises(AuthError) as cm:
+            self.auth.verify_decode_jwt(token)
+        self.assertEqual(cm.exception.status_code, 400)
+        self.auth.verify_decode_jwt(self.rotated_key.token())
+
+    def test_refresh_keeps_tokens_of_unchanged_keys(self):
+        token = self.key.token()
+        self.auth.verify_decode_jwt(token)
+        self.server.keys.append(self.rotated_key)
+        self.keys.refresh(force=True)
+        self.auth.verify_decode_jwt(token)
+        self.assertEqual(self.server.requests, 2)
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_cache_is_bounded(self):
+        tokens = [self.key.token(jti=str(i)) for i in range(6)]
+        for token in tokens:
+            self.auth.verify_decode_jwt(token)
+        self.assertEqual(len(self.cache), 4)
+        self.assertIsNone(self.cache.get(tokens[0]))
+        self.assertIsNotNone(self.cache.get(tokens[-1]))
+
+    def test_cache_hit_skips_verification(self):
+        token = self.key.token(["get:drinks-detail"])
+        no_cache = Auth(AUTH0_DOMAIN, API_AUDIENCE, keys=self.keys, cache_size=0)
+
+        started = time.perf_counter()
+        for _ in range(20):
+            no_cache.verify_decode_jwt(token)
+        uncached = time.perf_counter() - started
+        started = time.perf_counter()
+        for _ in range(20):
+            self.auth.verify_decode_jwt(token)
+        cached = time.perf_counter() - started
+
+        self.assertEqual(self.cache.misses, 1)
+        self.assertLess(cached * 5, uncached)
+
+
+class AuthTestCase(unittest.TestCase):
+    """This class represents the requires_auth test case"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.key, cls.other_key = signing_keys()
+
+    def setUp(self):
+        self.auth = Auth(
+            AUTH0_DOMAIN, API_AUDIENCE, keys=StaticKeys({"keys": [self.key.jwk()]})
+        )
+        self.app = Flask(__name__)
+
+        @self.app.route("/drinks", methods=["POST"])
+        @self.auth.requires_auth(["post:drinks", "get:drinks-detail"])
+        def post_drink(payload):
+            return jsonify({"success": True, "sub": payload["sub"]})
+
+        @self.app.errorhandler(AuthError)
+        def handle_auth_error(ex):
+            return jsonify({"success": False, "message": ex.error}), ex.status_code
+
+        self.client = self.app.test_client()
+
+    def post(self, token):
+        return self.client.post("/drinks", headers={"Authorization": f"Bearer {token}"})
+
+    def test_permissions(self):
+        token = self.key.token(["post:drinks", "get:drinks-detail", "patch:drinks"])
+        res = self.post(token)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()["sub"], "auth0|test")
+        # served from the verified tokens
+        self.assertEqual(self.post(token).status_code, 200)
+        self.assertEqual(self.auth.tokens.hits, 1)
+
+    def test_missing_permission(self):
+        res = self.post(self.key.token(["post:drinks"]))
+        self.assertEqual(res.status_code, 403)
+        self.assertEqual(res.get_json()["message"]["code"], "unauthorized")
+
+    def test_missing_permissions_claim(self):
+        res = self.post(self.key.token(permissions=None))
+        self.assertEqual(res.status_code, 400)
+
+    def test_malformed_permissions_claim(self):
+        res = self.post(self.key.token([["post:drinks"], "get:drinks-detail"]))
+        self.assertEqual(res.status_code, 401)
+        self.assertEqual(res.get_json()["message"]["code"], "invalid_claims")
+        self.assertEqual(len(self.auth.tokens), 0)
+
+    def test_missing_header(self):
+        self.assertEqual(self.client.post("/drinks").status_code, 401)
+
+    def test_wrong_audience(self):
+        res = self.post(self.key.token(["post:drinks"], aud="another-api"))
+        self.assertEqual(res.get_json()["message"]["code"], "invalid_claims")
+
+    def test_signed_by_another_key(self):
+        token = self.other_key.token(["post:drinks", "get:drinks-detail"])
+        header, payload, _ = token.split(".")
+        forged = ".".join((self.key.token().split(".")[0], payload, _))
+        self.assertEqual(self.post(forged).status_code, 400)
+        self.assertEqual(self.post(token).status_code, 400)
+
+    def test_unexpected_algorithm(self):
+        token = self.key.token(["post:drinks", "get:drinks-detail"])
+        _, payload, signature = token.split(".")
+        header = b64encode({"alg": "HS256", "typ": "JWT", "kid": "key-1"})
+        self.assertEqual(self.post(f"{header}.{payload}.{signature}").status_code, 400)
+
+    def test_timing_hooks(self):
+        stages = []
+        self.auth.timing_hooks.append(lambda stage, seconds: stages.append(stage))
+        token = self.key.token(["post:drinks", "get:drinks-detail"])
+        self.post(token)
+        self.assertEqual(stages, ["cache", "header", "key", "signature", "claims"])
+        del stages[:]
+        self.post(token)
+        self.assertEqual(stages, ["cache"])
+
+
+def b64encode(data):
+    raw = json.dumps(data).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,36 @@
-from sqlalchemy import Column, String, create_engine
+import os
+from sqlalchemy import Column, String, Integer, create_engine
+from sqlalchemy.pool import QueuePool
 from flask_sqlalchemy import SQLAlchemy
 import json
 
 database_path = os.environ['DATABASE_URL']
+# Heroku still hands out postgres:// URLs, which SQLAlchemy 1.4 refuses
+if database_path.startswith('postgres://'):
+    database_path = 'postgresql://' + database_path[len('postgres://'):]
+
+'''
+engine_options(uri)
+    the connection pool settings of the DB_* variables, the same as the
+    other projects read with fsnd_common/db.py; this app is deployed on its
+    own, without the rest of the repository, so it reads them itself
+'''
+def engine_options(uri, environ=os.environ):
+    options = {
+        'poolclass': QueuePool,
+        'pool_size': int(environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': float(environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': environ.get('DB_POOL_PRE_PING', '1') == '1',
+    }
+    statement_timeout = int(environ.get('DB_STATEMENT_TIMEOUT', 0))
+    if statement_timeout and uri.startswith('postgresql'):
+        options['connect_args'] = {
+            'options': f'-c statement_timeout={statement_timeout}'
+        }
+    return options
+
 
 db = SQLAlchemy()
 
@@ -13,6 +41,7 @@ setup_db(app)
 def setup_db(app, database_path=database_path):
     app.config["SQLALCHEMY_DATABASE_URI"] = database_path
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(database_path)
     db.app = app
     db.init_app(app)
     db.create_all()